@@ -1,2 +1,27 @@
+from . import constants, dictionaries, engine
 from .conversionMode import ConversionMode
+from .conversionResult import BudgetedResult, ConversionResult, Span
+from .coverageReport import CoverageReport, Token
 from .englishToKanaConverter import EnglishToKanaConverter
+from .persistentCache import PersistentCache
+from .resolutionTier import ResolutionTier
+
+
+def preload():
+    """
+    辞書と、JSONファイルから読み込む定数をすべて読み込み、変換エンジンが使う表（トライなど）を作る。
+    これらは通常最初に使われたときに読み込まれるが、サーバーなどで読み込みにかかる時間をあらかじめ済ませておきたい場合に使用する。
+    """
+    constants.preload()
+    dictionaries.preload()
+    engine.get().preload()
+
+
+def memoryReport():
+    """
+    読み込み済みの辞書と、変換エンジンが作成済みの表（トライなど）のメモリの使用量を、名前からdictionaries.MemoryUsageへのdictで返す。
+    辞書の名前は大文字（PHRASESなど）、表の名前は変換エンジンの要素の名前（trieなど）。
+    """
+    report = dictionaries.memoryReport()
+    report.update(engine.get().memoryReport())
+    return report
@@ -0,0 +1,211 @@
+# コマンドラインからの一括変換
+#
+# ファイル（省略時は標準入力）を1行ずつ変換し、標準出力またはファイルに書き込む。
+# 使い方: python -m englishToKanaConverter [オプション] [ファイル ...]
+# --format ndjsonを指定すると、各行を変換サーバー（server.pyを参照）と同じ形式のJSONの要求として扱い、応答を1行ずつ書き込む。
+# --workersに2以上を指定すると、入力を一定の行数ずつまとめて、その数のワーカープロセスで並列に変換する。出力の順序は入力と同じになる。
+# 終了時には、変換した行数と文字数、速度を標準エラー出力に表示する（--quietで抑制できる）。
+
+import argparse
+import collections
+import itertools
+import multiprocessing
+import os
+import re
+import sys
+import time
+from typing import List, Optional, TextIO, Tuple
+
+from . import preload
+from .conversionMode import ConversionMode
+from .englishToKanaConverter import EnglishToKanaConverter
+
+# 1度に変換する（ワーカープロセスへ渡す）行数の既定値
+BATCH_SIZE = 2000
+# 読み込みと書き込みのバッファの大きさ（バイト）の既定値
+BUFFER_SIZE = 1024 * 1024
+# ワーカープロセスあたりの、結果を待たずに渡しておくまとまりの数
+PENDING_PER_WORKER = 4
+
+# 読み込み時に、文字コードとして正しくないバイトを置き換えた文字（errors="surrogateescape"を参照）
+_UNDECODABLE_PATTERN = re.compile("[\udc80-\udcff]")
+
+# 変換に使うインスタンス（ワーカープロセスでは、forkで引き継いだもの、またはワーカーごとに作ったもの）
+_converter = None
+
+
+def _initConverter(cacheSize: int) -> None:
+    global _converter
+    if _converter is None:
+        _converter = EnglishToKanaConverter(cacheSize=cacheSize, wordCacheSize=cacheSize)
+
+
+def _convertBatch(lines: List[str], mode: ConversionMode, ndjson: bool, encoding: str = "utf-8") -> Tuple[str, int]:
+    """linesを変換し、書き込む文字列と、エラーになった要求の数（ndjsonの場合）を返す"""
+    if ndjson:
+        from .server import formatResponse, handleRequest
+        results = []
+        errors = 0
+        for line in lines:
+            if not line.strip():
+                continue
+            if _UNDECODABLE_PATTERN.search(line) is not None:
+                # 入力の文字コードとして正しくない行（_openを参照）
+                response = {"id": None, "error": f"invalid {encoding} sequence"}
+            else:
+                response = handleRequest(_converter, line, mode)
+            if "error" in response:
+                # 1行の誤りで全体を止めず、エラーの応答を書き込んで続ける
+                errors += 1
+            results.append(formatResponse(response, encoding))
+        return "".join(results), errors
+    process = _converter.process
+    return "".join([process(line, mode) for line in lines]), 0
+
+
+class _Statistics:
+    """変換した行数と文字数、エラーになった要求の数、かかった時間"""
+
+    def __init__(self) -> None:
+        self.lines = 0
+        self.characters = 0
+        self.errors = 0
+        self.start = time.perf_counter()
+
+    def add(self, lines: List[str], errors: int) -> None:
+        self.lines += len(lines)
+        self.characters += sum(map(len, lines))
+        self.errors += errors
+
+    def summary(self) -> str:
+        elapsed = time.perf_counter() - self.start
+        lineRate = self.lines / elapsed if elapsed else 0
+        characterRate = self.characters / elapsed if elapsed else 0
+        summary = f"{self.lines}行 {self.characters}文字 {elapsed:.3f}秒 （{lineRate:.0f}行/秒, {characterRate:.0f}文字/秒）"
+        if self.errors:
+            summary += f" エラー: {self.errors}行"
+        return summary
+
+
+def _batches(f: TextIO, size: int):
+    """ファイルfを、size行ずつのリストにして返す"""
+    while True:
+        lines = list(itertools.islice(f, size))
+        if not lines:
+            break
+        yield lines
+
+
+def _convertFile(source: TextIO, output: TextIO, args: argparse.Namespace, pool, statistics: _Statistics) -> None:
+    """sourceを変換してoutputに書き込む。poolがNoneでなければ、ワーカープロセスで変換する"""
+    ndjson = args.format == "ndjson"
+    if pool is None:
+        for lines in _batches(source, args.batch_size):
+            text, errors = _convertBatch(lines, args.mode, ndjson, args.encoding)
+            output.write(text)
+            statistics.add(lines, errors)
+        return
+    # 結果を待っているまとまり（入力と同じ順序）
+    pending = collections.deque()
+    for lines in _batches(source, args.batch_size):
+        pending.append((lines, pool.apply_async(_convertBatch, (lines, args.mode, ndjson, args.encoding))))
+        # 読み込みが先に進みすぎないよう、待っているまとまりが一定数を超えたら結果を書き込む
+        while len(pending) > args.workers * PENDING_PER_WORKER:
+            done, result = pending.popleft()
+            text, errors = result.get()
+            output.write(text)
+            statistics.add(done, errors)
+    while pending:
+        done, result = pending.popleft()
+        text, errors = result.get()
+        output.write(text)
+        statistics.add(done, errors)
+
+
+def _open(path: str, mode: str, args: argparse.Namespace) -> TextIO:
+    """
+    pathを開く。"-"なら標準入出力を、改行を変換しない大きなバッファのテキストファイルとして開き直す。
+    1つの不正なバイトで変換全体が止まらないよう、文字コードとして正しくないバイトはサロゲートに置き換えて読み込む。
+    ndjsonではその行だけをエラーの応答にし、linesではそのバイトを変換せずにそのまま書き込む。
+    """
+    errors = "surrogateescape" if "r" in mode or args.format == "lines" else None
+    if path == "-":
+        stream = sys.stdin if "r" in mode else sys.stdout
+        return open(stream.fileno(), mode, buffering=args.buffer_size, encoding=args.encoding, errors=errors, newline="", closefd=False)
+    return open(path, mode, buffering=args.buffer_size, encoding=args.encoding, errors=errors, newline="")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m englishToKanaConverter", description="ファイルまたは標準入力の英語をカナに変換する")
+    parser.add_argument("files", nargs="*", default=["-"], help="変換するファイル（省略時または\"-\"は標準入力）")
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument("-o", "--output", default="-", help="変換結果を書き込むファイル（既定値: 標準出力）")
+    output.add_argument("--output-dir", help="ファイルごとに、同じ名前で変換結果を書き込むディレクトリ")
+    parser.add_argument("--mode", choices=[mode.name for mode in ConversionMode], default=ConversionMode.STANDARD.name, help="変換モード（既定値: STANDARD）")
+    parser.add_argument("--format", choices=("lines", "ndjson"), default="lines", help="入出力の形式。linesは1行ずつ変換し、ndjsonは変換サーバーと同じ形式の要求と応答（既定値: lines）")
+    parser.add_argument("--workers", type=int, default=1, help="ワーカープロセスの数（既定値: 1。0ならCPUの数）")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help=f"1度に変換する行数（既定値: {BATCH_SIZE}）")
+    parser.add_argument("--buffer-size", type=int, default=BUFFER_SIZE, help=f"読み込みと書き込みのバッファの大きさ（バイト。既定値: {BUFFER_SIZE}）")
+    parser.add_argument("--cache-size", type=int, default=0, help="キャッシュの件数（既定値: 0。同じ行や単語が多い場合に指定する）")
+    parser.add_argument("--encoding", default="utf-8", help="入出力の文字コード（既定値: utf-8）")
+    parser.add_argument("-q", "--quiet", action="store_true", help="終了時に速度などを表示しない")
+    args = parser.parse_args(argv)
+    args.mode = ConversionMode[args.mode]
+    if args.workers <= 0:
+        args.workers = os.cpu_count() or 1
+    if args.batch_size <= 0:
+        parser.error("--batch-size must be positive")
+    if args.output_dir is not None:
+        if "-" in args.files:
+            parser.error("--output-dir cannot be used with standard input")
+        # 変換を始める前に、書き込み先が入力や他のファイルの書き込み先と重ならないことを確かめる
+        outputPaths = {}
+        for path in args.files:
+            outputPath = os.path.abspath(os.path.join(args.output_dir, os.path.basename(path)))
+            if outputPath == os.path.abspath(path):
+                parser.error(f"{path}: output file would overwrite the input")
+            if outputPath in outputPaths:
+                parser.error(f"{path}: output file would overwrite the output of {outputPaths[outputPath]}")
+            outputPaths[outputPath] = path
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    # 辞書などをワーカーの起動前に読み込んでおき、forkで引き継がせる
+    preload()
+    _initConverter(args.cache_size)
+    pool = None
+    if args.workers > 1:
+        if "fork" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("fork")
+        else:
+            context = multiprocessing.get_context()
+        pool = context.Pool(args.workers, initializer=_initConverter, initargs=(args.cache_size,))
+
+    statistics = _Statistics()
+    try:
+        if args.output_dir is None:
+            with _open(args.output, "w", args) as output:
+                for path in args.files:
+                    with _open(path, "r", args) as source:
+                        _convertFile(source, output, args, pool, statistics)
+        else:
+            for path in args.files:
+                outputPath = os.path.join(args.output_dir, os.path.basename(path))
+                with _open(path, "r", args) as source, _open(outputPath, "w", args) as output:
+                    _convertFile(source, output, args, pool, statistics)
+    except KeyboardInterrupt:
+        return 130
+    except BrokenPipeError:
+        # 出力先（headなど）が先に終了した。終了時に標準出力を書き込もうとして再びエラーにならないよう、捨て先に向ける
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return 1
+    finally:
+        if pool is not None:
+            pool.terminate()
+    if not args.quiet:
+        sys.stderr.write(statistics.summary() + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+# 変換サーバー（server.pyを参照）に接続するクライアント
+
+import itertools
+import json
+import socket
+from typing import Any, Dict, Iterable, List, Optional
+
+from .conversionMode import ConversionMode
+
+# processManyで、応答を待たずに送る要求の最大数
+PIPELINE_DEPTH = 256
+
+
+class ServerError(Exception):
+    """サーバーがエラーを返した"""
+
+
+class ConversionClient:
+    def __init__(self, path: Optional[str] = None, host: str = "127.0.0.1", port: Optional[int] = None, timeout: Optional[float] = None) -> None:
+        """pathを指定した場合はUnixドメインソケットに、そうでなければhost:portのTCPに接続する"""
+        if path is None and port is None:
+            raise ValueError("either path or port must be specified")
+        self._path = path
+        self._host = host
+        self._port = port
+        self._timeout = timeout
+        self._socket = None
+        self._reader = None
+        self._ids = itertools.count()
+        self._connect()
+
+    def _connect(self) -> None:
+        if self._path is not None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.settimeout(self._timeout)
+                sock.connect(self._path)
+            except BaseException:
+                sock.close()
+                raise
+        else:
+            sock = socket.create_connection((self._host, self._port), self._timeout)
+        self._socket = sock
+        self._reader = sock.makefile("rb")
+
+    def _disconnect(self) -> None:
+        if self._socket is not None:
+            self._reader.close()
+            self._socket.close()
+            self._socket = None
+            self._reader = None
+
+    def _receive(self, requestId: int) -> Dict[str, Any]:
+        """要求requestIdへの応答を受け取る"""
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("connection closed by server")
+        response = json.loads(line)
+        if response.get("id") != requestId:
+            if response.get("id") is None and "error" in response:
+                # 要求を処理できなかった（長すぎるなど）。サーバーは接続を閉じる
+                raise ServerError(response["error"])
+            raise ConnectionError(f"unexpected response id: {response.get('id')!r} (expected {requestId})")
+        return response
+
+    def _exchange(self, texts: List[str], mode: ConversionMode) -> List[str]:
+        """
+        textsをまとめて送り、変換結果を同じ順序のリストで返す。
+        エラーの応答があれば、残りの応答を読み捨ててから、最初のエラーをServerErrorとして送出する。
+        """
+        if self._socket is None:
+            # 前回の通信が途中で失敗した
+            self._connect()
+        ids = []
+        lines = []
+        for text in texts:
+            requestId = next(self._ids)
+            ids.append(requestId)
+            lines.append(json.dumps({"id": requestId, "text": text, "mode": mode.name}, ensure_ascii=False).encode("utf-8") + b"\n")
+        results = []
+        error = None
+        try:
+            self._socket.sendall(b"".join(lines))
+            for requestId in ids:
+                response = self._receive(requestId)
+                if "error" in response:
+                    if error is None:
+                        error = ServerError(response["error"])
+                elif error is None:
+                    results.append(response["result"])
+        except BaseException:
+            # 応答を読み残している可能性があり、以後の応答が別の要求のものになるため、この接続は使わない（次の要求で接続し直す）
+            self._disconnect()
+            raise
+        if error is not None:
+            raise error
+        return results
+
+    def process(self, s: str, mode: ConversionMode = ConversionMode.STANDARD) -> str:
+        """sを変換した結果を返す"""
+        if not isinstance(mode, ConversionMode):
+            raise TypeError(f"mode must be a ConversionMode, not {type(mode).__name__}")
+        return self._exchange([s], mode)[0]
+
+    def processMany(self, texts: Iterable[str], mode: ConversionMode = ConversionMode.STANDARD) -> List[str]:
+        """textsのそれぞれを変換した結果を、同じ順序のリストで返す。応答を待たずに続けて要求を送る"""
+        if not isinstance(mode, ConversionMode):
+            raise TypeError(f"mode must be a ConversionMode, not {type(mode).__name__}")
+        texts = list(texts)
+        results = []
+        # 送受信のバッファが溢れないよう、一定数ずつ送ってから応答を受け取る
+        for start in range(0, len(texts), PIPELINE_DEPTH):
+            results.extend(self._exchange(texts[start:start + PIPELINE_DEPTH], mode))
+        return results
+
+    def close(self) -> None:
+        self._disconnect()
+
+    def __enter__(self) -> "ConversionClient":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
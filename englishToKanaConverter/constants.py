@@ -1,5 +1,6 @@
 import json
 import os
+import threading
 
 _CONST_DIR = os.path.join(os.path.dirname(__file__), "constants")
 
@@ -16,8 +17,6 @@ def _loadDict(name):
 
 # 大文字が連続する際にそれぞれを独立した単語として扱う最大数
 UPPER_MAX = 3
-# 読み下しが必要な大文字列
-UPPER_IGNORE = _loadList("upper_ignore")
 # ローマ字読みを試みる最小文字数
 ROMAN_MIN = 3
 # ローマ字読みで、連続しても促音として変換しない文字
@@ -85,9 +84,43 @@ ZENHAN_TABLE = {
     "Ｚ": "Z",
     "’": "'",
 }
-# アクセント記号付きラテン文字（é, ñ, øなど）を、対応する普通のアルファベットに変換するテーブル
-DIACRITIC_TABLE = _loadDict("diacritics")
-# 必ずスペルアウトしなければならない文字列（読めたものとして扱われる）
-MUST_SPELLED = _loadList("must_spelled")
 # すべての単語をスペルアウトするモードで、文字と文字の間に挿入する区切り文字
 SPELL_SEPARATOR = " "
+# 英単語の間にこの文字数以上の英単語以外の部分があれば、それぞれの英単語を別々に変換する（英単語以外の部分は変換処理を省略する）
+SEGMENT_GAP = 256
+# 予算付きの変換（processWithBudget）で、辞書やローマ字による変換を試みる単語の最大文字数
+# 変換にかかる時間は単語の長さに比例するため、これより長い単語（実在の単語ではありえない）は、時間がかからない方法で変換する
+BUDGET_WORD_MAX = 64
+
+# JSONファイルから読み込む定数と、その読み込み方法
+# これらは最初に参照されたときに読み込まれる（__getattr__を参照）。from .constants import *では取り込まれないので、constants.UPPER_IGNOREのように参照すること
+_FILES = {
+    # 読み下しが必要な大文字列
+    "UPPER_IGNORE": (_loadList, "upper_ignore"),
+    # アクセント記号付きラテン文字（é, ñ, øなど）を、対応する普通のアルファベットに変換するテーブル
+    "DIACRITIC_TABLE": (_loadDict, "diacritics"),
+    # 必ずスペルアウトしなければならない文字列（読めたものとして扱われる）
+    "MUST_SPELLED": (_loadList, "must_spelled"),
+}
+_lock = threading.Lock()
+
+
+def __getattr__(name):
+    # 読み込み済みの定数はモジュールの属性になっているため、ここに来るのは初回の参照時のみ
+    if name not in _FILES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _lock:
+        if name not in globals():
+            loader, fileName = _FILES[name]
+            globals()[name] = loader(fileName)
+    return globals()[name]
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_FILES))
+
+
+def preload():
+    """JSONファイルから読み込む定数をすべて読み込む"""
+    for name in _FILES:
+        __getattr__(name)
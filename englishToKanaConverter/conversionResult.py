@@ -0,0 +1,169 @@
+import bisect
+import itertools
+from collections import namedtuple
+from typing import Callable, List, Tuple
+
+from .conversionMode import ConversionMode
+
+# 変換元の区間と、それに対応する変換結果の区間
+# sourceStart, sourceEnd: 変換元の文字列での開始位置と終了位置, outputStart, outputEnd: 変換結果の文字列での開始位置と終了位置
+Span = namedtuple("Span", ("sourceStart", "sourceEnd", "outputStart", "outputEnd"))
+# EnglishToKanaConverter.processWithBudgetの結果
+# text: 変換結果の文字列, degraded: 予算を使い切ったなどの理由で、辞書やローマ字による変換を行わなかった単語の区間（Span）のリスト
+BudgetedResult = namedtuple("BudgetedResult", ("text", "degraded"))
+
+# 1つのブロックにまとめる区間の数
+_BLOCK_SIZE = 256
+
+
+class _Block:
+    """連続する区間をまとめたもの。複数のConversionResultで共有するため、作成後は変更しない"""
+
+    __slots__ = ("sourceLengths", "outputs", "sourceLength", "outputLength")
+
+    def __init__(self, sourceLengths: List[int], outputs: List[str]) -> None:
+        # 区間ごとの変換元の長さと、変換結果
+        self.sourceLengths = sourceLengths
+        self.outputs = outputs
+        # ブロック全体の変換元と変換結果の長さ
+        self.sourceLength = sum(sourceLengths)
+        self.outputLength = sum(map(len, outputs))
+
+
+def _makeBlocks(sourceLengths: List[int], outputs: List[str]) -> List[_Block]:
+    return [_Block(sourceLengths[i:i + _BLOCK_SIZE], outputs[i:i + _BLOCK_SIZE]) for i in range(0, len(sourceLengths), _BLOCK_SIZE)]
+
+
+class ConversionResult:
+    """
+    EnglishToKanaConverter.processAlignedとprocessEditの結果。
+    変換元の文字列を区間（英単語は_splitUpperCaseで分割した単位ごとの単語、それ以外は連続する部分ごと）に分け、区間ごとの変換結果を保持する。
+    編集のたびに全体を作り直さずに済むよう、区間はブロックに分けて保持し、編集の影響を受けないブロックは編集前の結果と共有する。
+    """
+
+    def __init__(self, source: str, mode: ConversionMode, sourceLengths: List[int], outputs: List[str]) -> None:
+        # 変換元の文字列
+        self.source = source
+        # 変換モード
+        self.mode = mode
+        self._blocks = _makeBlocks(sourceLengths, outputs)
+        # 変換結果の文字列（textを参照）
+        self._text = None
+        # ブロックごとの変換元と変換結果の終了位置（_endsを参照）
+        self._sourceEnds = None
+        self._outputEnds = None
+
+    def _derive(self, source: str, blocks: List[_Block]) -> "ConversionResult":
+        """同じ変換モードで、変換元がsource、ブロックがblocksの結果を返す"""
+        result = ConversionResult.__new__(ConversionResult)
+        result.source = source
+        result.mode = self.mode
+        result._blocks = blocks
+        result._text = None
+        result._sourceEnds = None
+        result._outputEnds = None
+        return result
+
+    @property
+    def text(self) -> str:
+        """変換結果の文字列（初回の参照時に組み立てる）"""
+        if self._text is None:
+            self._text = "".join(["".join(block.outputs) for block in self._blocks])
+        return self._text
+
+    def __str__(self) -> str:
+        return self.text
+
+    def __repr__(self) -> str:
+        return f"ConversionResult({self.source!r}, {self.mode}, text={self.text!r})"
+
+    def _ends(self) -> Tuple[List[int], List[int]]:
+        """ブロックごとの、変換元での終了位置のリストと、変換結果での終了位置のリストを返す（初回の呼び出し時に求める）"""
+        if self._sourceEnds is None:
+            self._sourceEnds = list(itertools.accumulate(block.sourceLength for block in self._blocks))
+            self._outputEnds = list(itertools.accumulate(block.outputLength for block in self._blocks))
+        return self._sourceEnds, self._outputEnds
+
+    def _find(self, position: int) -> Tuple[int, int, int, int]:
+        """
+        変換元のposition文字目を含む区間を、(ブロックの番号, ブロック内での区間の番号, 区間の変換元での開始位置, 区間の変換結果での開始位置)で返す。
+        positionが変換元の末尾の場合は、(ブロックの数, 0, 変換元の長さ, 変換結果の長さ)を返す。
+        """
+        sourceEnds, outputEnds = self._ends()
+        index = bisect.bisect_right(sourceEnds, position)
+        if index == len(self._blocks):
+            return index, 0, len(self.source), outputEnds[-1] if outputEnds else 0
+        sourceStart = sourceEnds[index - 1] if index else 0
+        outputStart = outputEnds[index - 1] if index else 0
+        block = self._blocks[index]
+        for i, length in enumerate(block.sourceLengths):
+            if position < sourceStart + length:
+                return index, i, sourceStart, outputStart
+            sourceStart += length
+            outputStart += len(block.outputs[i])
+        raise AssertionError("inconsistent block lengths")
+
+    def _edit(self, source: str, start: int, end: int, sourceLengths: List[int], outputs: List[str], normalize: Callable[[str], str]) -> "ConversionResult":
+        """
+        変換元のstart文字目からend文字目の手前までの区間を、sourceLengthsとoutputsで置き換えた結果を返す（sourceは置き換え後の変換元）。
+        startとendが区間の途中にある場合、その区間は英単語以外の部分（前処理の結果がそのまま変換結果になる）なので、normalizeで前処理して境界で分ける。
+        """
+        blocks = self._blocks
+        first, firstIndex, firstStart, _ = self._find(start)
+        last, lastIndex, lastStart, _ = self._find(end)
+        # 置き換える範囲を含むブロックを作り直す
+        lengths = []
+        texts = []
+        if first < len(blocks):
+            lengths.extend(blocks[first].sourceLengths[:firstIndex])
+            texts.extend(blocks[first].outputs[:firstIndex])
+            if firstStart < start:
+                lengths.append(start - firstStart)
+                texts.append(normalize(self.source[firstStart:start]))
+        lengths.extend(sourceLengths)
+        texts.extend(outputs)
+        if last < len(blocks):
+            block = blocks[last]
+            if lastStart < end:
+                lengths.append(lastStart + block.sourceLengths[lastIndex] - end)
+                texts.append(block.outputs[lastIndex][len(normalize(self.source[lastStart:end])):])
+                lastIndex += 1
+            lengths.extend(block.sourceLengths[lastIndex:])
+            texts.extend(block.outputs[lastIndex:])
+        return self._derive(source, blocks[:first] + _makeBlocks(lengths, texts) + blocks[last + 1:])
+
+    def spans(self) -> List[Span]:
+        """すべての区間を、先頭から順に返す"""
+        spans = []
+        sourceStart = 0
+        outputStart = 0
+        for block in self._blocks:
+            for length, output in zip(block.sourceLengths, block.outputs):
+                spans.append(Span(sourceStart, sourceStart + length, outputStart, outputStart + len(output)))
+                sourceStart += length
+                outputStart += len(output)
+        return spans
+
+    def spanAtSource(self, index: int) -> Span:
+        """変換元のindex文字目を含む区間を返す"""
+        if not 0 <= index < len(self.source):
+            raise IndexError(f"source index out of range: {index}")
+        block, i, sourceStart, outputStart = self._find(index)
+        block = self._blocks[block]
+        return Span(sourceStart, sourceStart + block.sourceLengths[i], outputStart, outputStart + len(block.outputs[i]))
+
+    def spanAtOutput(self, index: int) -> Span:
+        """変換結果のindex文字目を含む区間を返す（読み上げ中の位置に対応する変換元の単語を求める場合などに使う）"""
+        sourceEnds, outputEnds = self._ends()
+        if not 0 <= index < (outputEnds[-1] if outputEnds else 0):
+            raise IndexError(f"output index out of range: {index}")
+        blockIndex = bisect.bisect_right(outputEnds, index)
+        sourceStart = sourceEnds[blockIndex - 1] if blockIndex else 0
+        outputStart = outputEnds[blockIndex - 1] if blockIndex else 0
+        block = self._blocks[blockIndex]
+        for length, output in zip(block.sourceLengths, block.outputs):
+            if index < outputStart + len(output):
+                return Span(sourceStart, sourceStart + length, outputStart, outputStart + len(output))
+            sourceStart += length
+            outputStart += len(output)
+        raise AssertionError("inconsistent block lengths")
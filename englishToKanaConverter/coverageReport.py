@@ -0,0 +1,49 @@
+from collections import Counter, namedtuple
+from typing import Dict, List, Optional, Tuple
+
+from .resolutionTier import ResolutionTier
+
+# 変換元の単語と、それを読むのに使われた手段
+# start, end: 変換元の文字列での開始位置と終了位置, word: 単語（前処理後）, tier: 読むのに使われた手段
+Token = namedtuple("Token", ("start", "end", "word", "tier"))
+
+
+class CoverageReport:
+    """
+    EnglishToKanaConverter.analyzeとanalyzeManyの結果。
+    単語は_engToKanaと同じ単位で数える。ただし辞書で読めなかった単語は、_romanToKanaと同じくアルファベットの連続ごとに数える。
+    """
+
+    def __init__(self) -> None:
+        # 単語の一覧（analyzeの場合のみ。analyzeManyでは作らない）
+        self.tokens = []
+        # ResolutionTierの値ごとの単語数（tiersを参照）
+        self._counts = [0] * len(ResolutionTier)
+        # 読めなかった単語と、その出現回数
+        self.unresolved = Counter()
+
+    @property
+    def tiers(self) -> Dict[ResolutionTier, int]:
+        """手段ごとの単語数"""
+        return {tier: self._counts[tier.value] for tier in ResolutionTier}
+
+    @property
+    def total(self) -> int:
+        """単語の総数"""
+        return sum(self._counts)
+
+    @property
+    def coverage(self) -> float:
+        """読めた単語の割合（単語がなければ1.0）"""
+        total = self.total
+        if not total:
+            return 1.0
+        return 1 - self._counts[ResolutionTier.UNRESOLVED.value] / total
+
+    def mostUnresolved(self, n: Optional[int] = None) -> List[Tuple[str, int]]:
+        """読めなかった単語を、出現回数の多い順に(単語, 出現回数)のリストで返す（nを指定すると上位n件）"""
+        return self.unresolved.most_common(n)
+
+    def __repr__(self) -> str:
+        tiers = ", ".join(f"{tier.name}={count}" for tier, count in self.tiers.items())
+        return f"CoverageReport({tiers}, unresolved={len(self.unresolved)} words)"
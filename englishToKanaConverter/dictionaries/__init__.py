@@ -1,19 +1,171 @@
 # 辞書データ
 
+import ctypes
+import glob
+import hashlib
 import json
 import os
+import sys
+import threading
+import warnings
+from collections import namedtuple
+
+from . import compactDictionary, compiledDictionary
 
 _DIR = os.path.dirname(__file__)
+# JSONから読み込んだ辞書を、省メモリの形式（compactDictionary.pyを参照）に変換するか（useCompactを参照）
+_compact = False
 
 
 def _load(name):
-    with open(os.path.join(_DIR, f"{name}.json"), encoding="utf-8") as f:
-        return json.load(f)
+    path = os.path.join(_DIR, f"{name}.json")
+    # コンパイル済み辞書（tools/optimizeDic.pyで生成）があれば、JSONをパースせずにそちらを使う
+    compiledPath = os.path.join(_DIR, f"{name}.bin")
+    compiled = compiledDictionary.load(compiledPath, path)
+    if compiled is not None:
+        return compiled
+    if os.path.isfile(compiledPath):
+        warnings.warn(f"{os.path.basename(compiledPath)}が{os.path.basename(path)}と一致しないため使用しません。tools/optimizeDic.pyを実行してください。", RuntimeWarning)
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if _compact:
+        data = compactDictionary.CompactDictionary(data)
+        # 元のdictは不要になるため、その領域をOSに返す
+        releaseFreedMemory()
+    return data
+
+
+# 辞書から生成する表（dictionaryTrie.pyとwordTable.pyを参照）のファイル名
+# 辞書の内容を表すファイルではないため、sourcePathsには含めない
+DERIVED_FILES = ("trie.bin", "wordTable.bin")
+_sourceHash = None
+
+
+def sourcePaths():
+    """辞書と定数の内容を表すファイル（辞書はJSON。元のJSONがなければコンパイル済み辞書）のパスを返す"""
+    paths = glob.glob(os.path.join(_DIR, "*.json"))
+    # 元のJSONがなければ、コンパイル済み辞書を使う（_loadを参照）
+    paths += [path for path in glob.glob(os.path.join(_DIR, "*.bin")) if os.path.basename(path) not in DERIVED_FILES and not os.path.isfile(path[:-4] + ".json")]
+    paths += glob.glob(os.path.join(_DIR, os.pardir, "constants", "*.json"))
+    return sorted(paths, key=lambda path: os.path.relpath(path, _DIR))
+
+
+def sourceDigest(tag):
+    """
+    sourcePathsのファイルの内容と、文字列tagから求めた32バイトのハッシュ値を返す。辞書から生成する表が古いかどうかを判定するのに使う。
+    ファイルの内容は、初回の呼び出し時に1度だけ読み込む。
+    """
+    global _sourceHash
+    with _lock:
+        if _sourceHash is None:
+            digest = hashlib.sha256()
+            for path in sourcePaths():
+                with open(path, "rb") as f:
+                    content = f.read()
+                digest.update(f"{os.path.relpath(path, _DIR)} {len(content)}\n".encode())
+                digest.update(content)
+            _sourceHash = digest.digest()
+    return hashlib.sha256(tag.encode() + b"\n" + _sourceHash).digest()
+
+
+# 辞書の名前と、ファイル名の対応
+# 各辞書は、最初に参照されたときに読み込まれる（__getattr__を参照）
+_FILES = {
+    "PHRASES": "phrases",
+    "PREFIX": "prefix",
+    "ROMAN": "roman",
+    "SPELL": "spell",
+    "SUFFIX": "suffix",
+    "WORDS": "words",
+}
+_lock = threading.Lock()
+
+
+def __getattr__(name):
+    # 読み込み済みの辞書はモジュールの属性になっているため、ここに来るのは初回の参照時のみ
+    if name not in _FILES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _lock:
+        if name not in globals():
+            globals()[name] = _load(_FILES[name])
+    return globals()[name]
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_FILES))
+
+
+def preload():
+    """すべての辞書を読み込む"""
+    for name in _FILES:
+        __getattr__(name)
+
+
+def useCompact(enabled=True):
+    """
+    以後にJSONから読み込む辞書を、省メモリの形式（compactDictionary.pyを参照）で保持するかどうかを設定する。
+    コンパイル済み辞書を使える辞書と、すでに読み込んだ辞書には影響しないため、変換やpreloadの前に呼び出すこと。
+    """
+    global _compact
+    with _lock:
+        _compact = enabled
+
+
+# 辞書や表のメモリの使用量
+# representation: 形式（辞書では"dict", "compact", "compiled"のいずれか）, entries: 登録数,
+# dictBytes: 通常のdictとして保持した場合のバイト数（キーと値の文字列を含む。dictに相当しない表ではNone）,
+# bytes: プロセスごとに保持しているバイト数, sharedBytes: メモリマップしたファイルのバイト数（同じホスト上のプロセスで共有される）,
+# memoBytes: 検索結果の記憶のバイト数（変換した単語が増えるほど、上限まで増える）
+MemoryUsage = namedtuple("MemoryUsage", ("representation", "entries", "dictBytes", "bytes", "sharedBytes", "memoBytes"))
+
+
+def _dictSizeof(data):
+    """dataと同じ内容を、JSONから読み込んだdictとして保持した場合のバイト数"""
+    if isinstance(data, dict):
+        return sys.getsizeof(data) + sum(sys.getsizeof(key) + sys.getsizeof(value) for key, value in data.items())
+    # 同じ内容のdictを作るとメモリを大量に使うため、同じ登録数のdictの大きさと、キーと値の文字列の大きさを足す
+    return sys.getsizeof(dict.fromkeys(range(len(data)))) + sum(sys.getsizeof(key) + sys.getsizeof(value) for key, value in data.pairs())
+
+
+def memoryUsage(data):
+    """辞書（dict、または_loadが返す形式）dataのメモリの使用量をMemoryUsageで返す"""
+    if isinstance(data, compactDictionary.CompactDictionary):
+        return MemoryUsage("compact", len(data), _dictSizeof(data), data.sizeof(), 0, data.memoSizeof())
+    if isinstance(data, compiledDictionary.CompiledDictionary):
+        return MemoryUsage("compiled", len(data), _dictSizeof(data), data.sizeof(), data.mappedSize(), data.memoSizeof())
+    dictBytes = _dictSizeof(data)
+    return MemoryUsage("dict", len(data), dictBytes, dictBytes, 0, 0)
+
+
+def memoryReport():
+    """
+    読み込み済みの辞書ごとのメモリの使用量を、辞書の名前からMemoryUsageへのdictで返す（読み込んでいない辞書は含まない）。
+    辞書から作る表（トライなど）も含めた使用量は、englishToKanaConverter.memoryReportで得られる。
+    """
+    report = {}
+    for name in _FILES:
+        data = globals().get(name)
+        if data is not None:
+            report[name] = memoryUsage(data)
+    return report
+
+
+_mallocTrim = None
 
 
-PHRASES = _load("phrases")
-PREFIX = _load("prefix")
-ROMAN = _load("roman")
-SPELL = _load("spell")
-SUFFIX = _load("suffix")
-WORDS = _load("words")
+def releaseFreedMemory():
+    """
+    解放済みのメモリを、できるだけOSに返す（glibcのmalloc_trim。glibc以外の環境では何もしない）。
+    JSONの読み込みなどで一時的に作った大量のオブジェクトの領域は、解放してもプロセスに残り、RSSに数えられたままになることがあるため、
+    辞書や表を作り終えた後に呼び出す。
+    """
+    global _mallocTrim
+    if _mallocTrim is None:
+        _mallocTrim = False
+        if sys.platform.startswith("linux"):
+            try:
+                _mallocTrim = ctypes.CDLL(None).malloc_trim
+            except (AttributeError, OSError):
+                pass
+    if _mallocTrim:
+        _mallocTrim(0)
@@ -0,0 +1,116 @@
+# 省メモリ辞書
+#
+# JSONから読み込んだ辞書を、少ないメモリで保持する形式に変換したもの（useCompactを参照）。
+# 通常のdictでは、登録1件ごとにキーと値の文字列オブジェクトと、ハッシュ表の領域が必要になる。
+# この形式では、キーを並べ替えて1つの文字列に連結し、二分探索で検索する。値は重複を除いてから1つの文字列に連結し、キーごとには値の番号だけを持つ。
+# 検索はdictより遅いため、検索結果を一定数まで覚えておく（compiledDictionary.CompiledDictionaryと同じ）。
+# コンパイル済み辞書（compiledDictionary.pyを参照）を使えない場合に使う。使える場合は、コンパイル済み辞書のほうがメモリの使用量は少ない。
+
+import sys
+from array import array
+from collections.abc import Mapping
+
+# 検索結果を覚えておく最大件数（超えたら一旦すべて忘れる）
+_MEMO_MAX = 4096
+# 検索結果が見つからなかったことを表す
+_MISSING = object()
+
+
+def _offsets(strings):
+    """stringsを連結した文字列での、各要素の開始位置と、末尾の位置を並べた配列"""
+    offsets = array("I", [0])
+    position = 0
+    for s in strings:
+        position += len(s)
+        offsets.append(position)
+    return offsets
+
+
+class CompactDictionary(Mapping):
+    """dictの内容を省メモリの形式で保持する、読み取り専用のdictとして振る舞うもの"""
+
+    def __init__(self, data):
+        keys = sorted(data)
+        values = sorted(set(data.values()))
+        numbers = {value: number for number, value in enumerate(values)}
+        # キーを連結した文字列と、各キーの位置
+        self._keys = "".join(keys)
+        self._keyOffsets = _offsets(keys)
+        # 重複を除いた値を連結した文字列と、各値の位置
+        self._values = "".join(values)
+        self._valueOffsets = _offsets(values)
+        # キーごとの値の番号
+        self._valueNumbers = array("H" if len(values) <= 0xFFFF else "I", [numbers[data[key]] for key in keys])
+        self._count = len(keys)
+        self._memo = {}
+
+    def _key(self, number):
+        return self._keys[self._keyOffsets[number]:self._keyOffsets[number + 1]]
+
+    def _value(self, number):
+        valueNumber = self._valueNumbers[number]
+        return self._values[self._valueOffsets[valueNumber]:self._valueOffsets[valueNumber + 1]]
+
+    def _find(self, key):
+        keys = self._keys
+        offsets = self._keyOffsets
+        low = 0
+        high = self._count
+        while low < high:
+            middle = (low + high) // 2
+            found = keys[offsets[middle]:offsets[middle + 1]]
+            if found < key:
+                low = middle + 1
+            elif found > key:
+                high = middle
+            else:
+                return self._value(middle)
+        return _MISSING
+
+    def _lookup(self, key):
+        memo = self._memo
+        value = memo.get(key)
+        if value is None:
+            if not isinstance(key, str):
+                return _MISSING
+            value = self._find(key)
+            if len(memo) >= _MEMO_MAX:
+                memo.clear()
+            memo[key] = value
+        return value
+
+    def get(self, key, default=None):
+        value = self._lookup(key)
+        if value is _MISSING:
+            return default
+        return value
+
+    def __getitem__(self, key):
+        value = self._lookup(key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self._lookup(key) is not _MISSING
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for number in range(self._count):
+            yield self._key(number)
+
+    def pairs(self):
+        """(キー, 値)を、検索結果を覚えずに順に返す"""
+        for number in range(self._count):
+            yield self._key(number), self._value(number)
+
+    def sizeof(self):
+        """保持している内容のバイト数（検索結果の記憶を除く）"""
+        return sys.getsizeof(self) + sum(sys.getsizeof(item) for item in (self._keys, self._keyOffsets, self._values, self._valueOffsets, self._valueNumbers))
+
+    def memoSizeof(self):
+        """検索結果の記憶のバイト数（キーと値の文字列を含む。見つからなかったことを表す_MISSINGは共有しているため数えない）"""
+        memo = list(self._memo.items())
+        return sys.getsizeof(self._memo) + sum(sys.getsizeof(key) + (sys.getsizeof(value) if value is not _MISSING else 0) for key, value in memo)
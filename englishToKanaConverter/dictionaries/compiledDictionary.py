@@ -0,0 +1,231 @@
+# コンパイル済み辞書
+#
+# JSON形式の辞書を、メモリマップしてそのまま検索できるバイナリ形式に変換したもの。
+# JSONのパースが不要なので読み込みがほぼ一瞬で終わり、ページキャッシュを通じて同じホスト上の全プロセスでデータが共有される。
+# 正本はあくまでJSONであり、コンパイル済み辞書はtools/optimizeDic.pyで生成する。
+# JSONから作るほか、単語全体の変換結果の表（wordTable.pyを参照）のように、複数のファイルから作ったdictを保存するのにも使う。
+#
+# ファイル形式（数値はすべてリトルエンディアン）:
+#   ヘッダ: マジックナンバー、形式のバージョン、登録数、スロット数、元JSONのサイズ・更新日時・SHA-256
+#   スロット: 32bit整数 x スロット数（エントリ番号+1。0は空き）。キーのCRC32をスロット数で割った余りから線形探索する
+#   エントリ: (キーの位置, キーの長さ, 値の位置, 値の長さ) x 登録数
+#   文字列: UTF-8でエンコードしたキーと値を連結したもの
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+from collections.abc import Mapping
+
+MAGIC = b"ETKD"
+# ファイル形式を変更した場合は必ず増やすこと
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct("<4sIIIQQ32s")
+_SLOT = struct.Struct("<I")
+_ENTRY = struct.Struct("<IIII")
+# 検索結果を覚えておく最大件数（超えたら一旦すべて忘れる）
+_MEMO_MAX = 65536
+# 検索結果が見つからなかったことを表す
+_MISSING = object()
+
+
+def _sourceDigest(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).digest()
+
+
+def _slotCountFor(count):
+    # 負荷率が50%以下になる2のべき乗
+    slotCount = 1
+    while slotCount < count * 2:
+        slotCount *= 2
+    return slotCount
+
+
+def build(sourcePath, outputPath):
+    """JSON形式の辞書sourcePathをコンパイルし、outputPathに保存する"""
+    with open(sourcePath, encoding="utf-8") as f:
+        data = json.load(f)
+    stat = os.stat(sourcePath)
+    _write(data, outputPath, stat.st_size, stat.st_mtime_ns, _sourceDigest(sourcePath))
+
+
+def buildMapping(data, outputPath, digest):
+    """
+    dict dataをコンパイルし、outputPathに保存する。
+    digestは、dataの元になったファイルなどから求めた32バイトのハッシュ値で、loadMappingで古いかどうかを判定するのに使う。
+    """
+    _write(data, outputPath, 0, 0, digest)
+
+
+def _write(data, outputPath, sourceSize, sourceMtime, digest):
+    slotCount = _slotCountFor(len(data))
+    slots = [0] * slotCount
+    entries = []
+    strings = bytearray()
+    for number, (key, value) in enumerate(data.items()):
+        keyBytes = key.encode("utf-8")
+        valueBytes = value.encode("utf-8")
+        entries.append((len(strings), len(keyBytes), len(strings) + len(keyBytes), len(valueBytes)))
+        strings += keyBytes
+        strings += valueBytes
+        slot = zlib.crc32(keyBytes) & (slotCount - 1)
+        while slots[slot]:
+            slot = (slot + 1) & (slotCount - 1)
+        slots[slot] = number + 1
+    # 文字列の位置をファイル先頭からの位置に直す
+    base = _HEADER.size + _SLOT.size * slotCount + _ENTRY.size * len(entries)
+    body = bytearray()
+    body += _HEADER.pack(MAGIC, FORMAT_VERSION, len(data), slotCount, sourceSize, sourceMtime, digest)
+    body += struct.pack(f"<{slotCount}I", *slots)
+    for keyOffset, keyLength, valueOffset, valueLength in entries:
+        body += _ENTRY.pack(base + keyOffset, keyLength, base + valueOffset, valueLength)
+    body += strings
+    # 読み込み中のプロセスに影響しないよう、別名で書き出してから置き換える
+    tmpPath = f"{outputPath}.tmp"
+    with open(tmpPath, "wb") as f:
+        f.write(body)
+    os.replace(tmpPath, outputPath)
+
+
+def _open(path):
+    """pathをメモリマップし、(データ, ヘッダの内容)を返す。ファイルが存在しないか、形式が異なる場合はNoneを返す"""
+    try:
+        with open(path, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    if len(data) < _HEADER.size:
+        data.close()
+        return None
+    header = _HEADER.unpack_from(data, 0)
+    if header[0] != MAGIC or header[1] != FORMAT_VERSION:
+        data.close()
+        return None
+    return data, header
+
+
+def load(path, sourcePath):
+    """
+    コンパイル済み辞書pathを読み込む。
+    ファイルが存在しない、形式が異なる、またはsourcePathの内容と一致しない（古い）場合はNoneを返す。
+    """
+    opened = _open(path)
+    if opened is None:
+        return None
+    data, (magic, version, count, slotCount, sourceSize, sourceMtime, digest) = opened
+    try:
+        stat = os.stat(sourcePath)
+        if stat.st_size != sourceSize or stat.st_mtime_ns != sourceMtime:
+            # 更新日時だけが変わった（チェックアウトし直したなど）場合もあるので、内容で判定する
+            if _sourceDigest(sourcePath) != digest:
+                data.close()
+                return None
+    except OSError:
+        # 元のJSONがない場合は、コンパイル済み辞書をそのまま使う
+        pass
+    return CompiledDictionary(data, count, slotCount)
+
+
+def loadMapping(path, digest):
+    """buildMappingで保存したpathを読み込む。ファイルが存在しない、形式が異なる、または保存時のハッシュ値がdigestと異なる（古い）場合はNoneを返す"""
+    opened = _open(path)
+    if opened is None:
+        return None
+    data, (magic, version, count, slotCount, sourceSize, sourceMtime, savedDigest) = opened
+    if savedDigest != digest:
+        data.close()
+        return None
+    return CompiledDictionary(data, count, slotCount)
+
+
+def _memoSizeof(memo):
+    """検索結果の記憶memoのバイト数（見つからなかったことを表す_MISSINGは共有しているため数えない）"""
+    return sys.getsizeof(memo) + sum(sys.getsizeof(key) + (sys.getsizeof(value) if value is not _MISSING else 0) for key, value in list(memo.items()))
+
+
+class CompiledDictionary(Mapping):
+    """メモリマップしたコンパイル済み辞書。読み取り専用のdictとして振る舞う"""
+
+    def __init__(self, data, count, slotCount):
+        self._data = data
+        self._count = count
+        self._mask = slotCount - 1
+        self._slotsOffset = _HEADER.size
+        self._entriesOffset = _HEADER.size + _SLOT.size * slotCount
+        self._memo = {}
+
+    def _entry(self, number):
+        return _ENTRY.unpack_from(self._data, self._entriesOffset + _ENTRY.size * number)
+
+    def _find(self, key):
+        keyBytes = key.encode("utf-8")
+        data = self._data
+        slot = zlib.crc32(keyBytes) & self._mask
+        while True:
+            number = _SLOT.unpack_from(data, self._slotsOffset + _SLOT.size * slot)[0]
+            if not number:
+                return _MISSING
+            keyOffset, keyLength, valueOffset, valueLength = self._entry(number - 1)
+            if keyLength == len(keyBytes) and data[keyOffset:keyOffset + keyLength] == keyBytes:
+                return data[valueOffset:valueOffset + valueLength].decode("utf-8")
+            slot = (slot + 1) & self._mask
+
+    def _lookup(self, key):
+        memo = self._memo
+        value = memo.get(key)
+        if value is None:
+            if not isinstance(key, str):
+                return _MISSING
+            value = self._find(key)
+            if len(memo) >= _MEMO_MAX:
+                memo.clear()
+            memo[key] = value
+        return value
+
+    def get(self, key, default=None):
+        value = self._lookup(key)
+        if value is _MISSING:
+            return default
+        return value
+
+    def __getitem__(self, key):
+        value = self._lookup(key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self._lookup(key) is not _MISSING
+
+    def __len__(self):
+        return self._count
+
+    def sizeof(self):
+        """プロセスごとに保持しているバイト数（検索結果の記憶と、メモリマップしたファイルを除く）"""
+        return sys.getsizeof(self) + sys.getsizeof(self.__dict__)
+
+    def mappedSize(self):
+        """メモリマップしたファイルの大きさ（同じホスト上のプロセスで共有される）"""
+        return len(self._data)
+
+    def memoSizeof(self):
+        """検索結果の記憶のバイト数（キーと値の文字列を含む）"""
+        return _memoSizeof(self._memo)
+
+    def __iter__(self):
+        data = self._data
+        for number in range(self._count):
+            keyOffset, keyLength = self._entry(number)[:2]
+            yield data[keyOffset:keyOffset + keyLength].decode("utf-8")
+
+    def pairs(self):
+        """(キー, 値)を、検索結果を覚えずに順に返す"""
+        data = self._data
+        for number in range(self._count):
+            keyOffset, keyLength, valueOffset, valueLength = self._entry(number)
+            yield data[keyOffset:keyOffset + keyLength].decode("utf-8"), data[valueOffset:valueOffset + valueLength].decode("utf-8")
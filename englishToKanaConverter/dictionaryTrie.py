@@ -0,0 +1,224 @@
+# 複合語分解（_partsToKana）で使う辞書の接頭部分木（トライ）
+#
+# PHRASES, PREFIX, SUFFIX, MUST_SPELLEDのキーをまとめ、ノードごとにどの辞書のキーであるかをフラグで持つ。
+# フラグが0のノードは、いずれかのキーの途中であることだけを表す。
+# ノードは幅優先の順に番号を付け、次の3つの配列で表す（文字列のオブジェクトをノードごとに作らないため、メモリの使用量が少ない）。
+#   labels: 各ノードへ至る辺の文字を、ノードの番号順に並べた文字列（根の位置は使わない）
+#   childStarts: ノードnの子の番号はchildStarts[n]からchildStarts[n + 1] - 1まで（幅優先の順なので、子の番号は連続する）
+#   flags: 各ノードのフラグ
+# 検索時は、根から1文字ずつ、子の範囲のlabelsから次の文字を探してたどる。
+# tools/optimizeDic.pyで、メモリマップしてそのまま使えるファイル（trie.bin）に保存しておけば、同じホスト上の全プロセスで共有される。
+# ファイルがない、または古い場合は、初回の参照時に辞書から構築する。
+#
+# ファイル形式（数値はすべてリトルエンディアン）:
+#   ヘッダ: マジックナンバー、形式のバージョン、ノード数、フラグごとのキーの最大の長さ、元の辞書と定数のハッシュ値
+#   childStarts: 32bit整数 x (ノード数 + 1)
+#   flags: 8bit整数 x ノード数
+#   labels: ASCII文字 x ノード数
+
+import mmap
+import os
+import struct
+import sys
+import threading
+import warnings
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from . import constants, dictionaries
+
+# ノードのフラグ
+PHRASE = 1
+PREFIX = 2
+SUFFIX = 4
+MUST_SPELLED = 8
+# 単独のアポストロフィー（変換できたものとして扱う）
+APOSTROPHE = 16
+_FLAGS = (PHRASE, PREFIX, SUFFIX, MUST_SPELLED, APOSTROPHE)
+
+PATH = os.path.join(os.path.dirname(__file__), "dictionaries", "trie.bin")
+MAGIC = b"ETKT"
+# ファイル形式を変更した場合は必ず増やすこと
+FORMAT_VERSION = 1
+_HEADER = struct.Struct(f"<4sII{len(_FLAGS)}I32s")
+
+
+class DictionaryTrie:
+    def __init__(self, labels: str, childStarts, flags, maxLengths: Dict[int, int]) -> None:
+        self._labels = labels
+        self._childStarts = childStarts
+        self._flags = flags
+        # フラグごとの、キーの最大の長さ
+        self._maxLengths = maxLengths
+
+    def __len__(self) -> int:
+        """ノードの数"""
+        return len(self._labels)
+
+    def flags(self, key: str) -> int:
+        """keyに一致するキーのフラグを返す（一致しなければ0）"""
+        labels = self._labels
+        childStarts = self._childStarts
+        node = 0
+        for char in key:
+            node = labels.find(char, childStarts[node], childStarts[node + 1])
+            if node < 0:
+                return 0
+        return self._flags[node]
+
+    def maxLength(self, flag: int) -> int:
+        """フラグflagを持つキーの最大の長さを返す"""
+        return self._maxLengths.get(flag, 0)
+
+    def matches(self, s: str, start: int = 0) -> List[Tuple[int, int]]:
+        """
+        s[start:]の先頭部分に一致するキーを、短いものから順に(終了位置, フラグ)のリストで返す。
+        sはすべて大文字であること。
+        """
+        labels = self._labels
+        childStarts = self._childStarts
+        flags = self._flags
+        result = []
+        node = 0
+        for end in range(start, len(s)):
+            node = labels.find(s[end], childStarts[node], childStarts[node + 1])
+            if node < 0:
+                # これより長いキーは存在しない
+                break
+            if flags[node]:
+                result.append((end + 1, flags[node]))
+        return result
+
+    def sizeof(self) -> int:
+        """プロセスごとに保持しているバイト数（メモリマップしたファイルを使っている場合は、ファイルにない文字列labelsの分だけ）"""
+        size = sys.getsizeof(self._labels)
+        if isinstance(self._childStarts, array):
+            size += sys.getsizeof(self._childStarts) + sys.getsizeof(self._flags)
+        return size
+
+    def mappedSize(self) -> int:
+        """メモリマップしたファイルの大きさ（同じホスト上のプロセスで共有される。ファイルを使っていなければ0）"""
+        if isinstance(self._childStarts, array):
+            return 0
+        # childStartsは、メモリマップしたファイル全体の一部のビュー
+        return len(self._childStarts.obj)
+
+    def save(self, path: str, digest: bytes) -> None:
+        """pathに保存する。digestは、元の辞書と定数のハッシュ値（dictionaries.sourceDigestを参照）"""
+        body = bytearray(_HEADER.pack(MAGIC, FORMAT_VERSION, len(self), *(self.maxLength(flag) for flag in _FLAGS), digest))
+        body += array("I", self._childStarts).tobytes()
+        body += bytes(self._flags)
+        body += self._labels.encode("ascii")
+        # 読み込み中のプロセスに影響しないよう、別名で書き出してから置き換える
+        tmpPath = f"{path}.tmp"
+        with open(tmpPath, "wb") as f:
+            f.write(body)
+        os.replace(tmpPath, path)
+
+
+def build(entries: Iterable[Tuple[Iterable[str], int]]) -> DictionaryTrie:
+    """(キーのイテラブル, フラグ)のイテラブルentriesから、トライを構築する"""
+    keyFlags = {}
+    maxLengths = {}
+    for keys, flag in entries:
+        for key in keys:
+            if not key:
+                continue
+            keyFlags[key] = keyFlags.get(key, 0) | flag
+            if len(key) > maxLengths.get(flag, 0):
+                maxLengths[flag] = len(key)
+    keys = sorted(keyFlags)
+    labels = ["\0"]
+    flags = array("B", [0])
+    childStarts = array("I")
+    # 深さごとに、その深さのノードをキーの先頭部分の辞書順に並べる（これが幅優先の順になる）
+    # 辞書順に並べたキーの先頭部分も辞書順に並ぶため、同じ先頭部分は隣り合う
+    level = [""]
+    depth = 0
+    # 次に番号を付けるノード
+    nextNode = 1
+    while level:
+        depth += 1
+        keys = [key for key in keys if len(key) >= depth]
+        nextLevel = []
+        # levelの各ノードの子の数
+        counts = [0] * len(level)
+        parent = 0
+        for key in keys:
+            prefix = key[:depth]
+            if nextLevel and nextLevel[-1] == prefix:
+                continue
+            nextLevel.append(prefix)
+            while level[parent] != prefix[:-1]:
+                parent += 1
+            counts[parent] += 1
+            labels.append(prefix[-1])
+            flags.append(keyFlags.get(prefix, 0))
+        for count in counts:
+            childStarts.append(nextNode)
+            nextNode += count
+        level = nextLevel
+    childStarts.append(nextNode)
+    return DictionaryTrie("".join(labels), childStarts, flags, maxLengths)
+
+
+def load(path: str, digest: bytes) -> Optional[DictionaryTrie]:
+    """saveで保存したpathを読み込む。ファイルが存在しない、形式が異なる、またはdigestと一致しない（古い）場合はNoneを返す"""
+    try:
+        with open(path, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    if len(data) < _HEADER.size:
+        data.close()
+        return None
+    magic, version, count, *maxLengths, savedDigest = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != FORMAT_VERSION or savedDigest != digest or len(data) != _HEADER.size + 4 * (count + 1) + 2 * count:
+        data.close()
+        return None
+    view = memoryview(data)
+    offset = _HEADER.size
+    childStarts = view[offset:offset + 4 * (count + 1)].cast("I")
+    offset += 4 * (count + 1)
+    flags = view[offset:offset + count]
+    offset += count
+    # 文字の検索（str.find）を使うため、labelsだけは文字列にする
+    labels = data[offset:offset + count].decode("ascii")
+    return DictionaryTrie(labels, childStarts, flags, {flag: length for flag, length in zip(_FLAGS, maxLengths) if length})
+
+
+def _entries():
+    return ((dictionaries.PHRASES, PHRASE), (dictionaries.PREFIX, PREFIX), (dictionaries.SUFFIX, SUFFIX), (constants.MUST_SPELLED, MUST_SPELLED), (("'",), APOSTROPHE))
+
+
+def sourceDigest() -> bytes:
+    """トライの元になる辞書と定数のハッシュ値"""
+    return dictionaries.sourceDigest(f"trie {FORMAT_VERSION}")
+
+
+def save(path: str = PATH) -> int:
+    """辞書からトライを構築してpathに保存し、ノードの数を返す"""
+    trie = build(_entries())
+    trie.save(path, sourceDigest())
+    return len(trie)
+
+
+_trie = None
+_lock = threading.Lock()
+
+
+def get() -> DictionaryTrie:
+    """辞書のトライを返す（初回の呼び出し時に、ファイルから読み込むか、辞書から構築する）"""
+    global _trie
+    if _trie is None:
+        with _lock:
+            if _trie is None:
+                trie = load(PATH, sourceDigest())
+                if trie is None:
+                    if os.path.isfile(PATH):
+                        warnings.warn(f"{os.path.basename(PATH)}が辞書と一致しないため使用しません。tools/optimizeDic.pyを実行してください。", RuntimeWarning)
+                    trie = build(_entries())
+                    # 構築中に一時的に作った大量の文字列の領域を、OSに返す
+                    dictionaries.releaseFreedMemory()
+                _trie = trie
+    return _trie
@@ -0,0 +1,115 @@
+# 変換エンジン
+#
+# 変換に使う辞書と、辞書から作る表（トライ、オートマトンなど）をまとめたもの。プロセス内で1つだけ作り（getを参照）、すべてのEnglishToKanaConverterで共有する。
+# 各要素は最初に参照されたときに作られ（__getattr__を参照）、以後は変更されないため、複数のスレッドから同時に使っても安全である。
+# 要素の作成はロックで保護しているため、GILのないCPythonでも同じ要素が2回作られたり、作りかけの要素が見えたりすることはない。
+
+import string
+import threading
+from typing import Dict, Optional
+
+from . import constants, dictionaries, dictionaryTrie, romanAutomaton, wordTable
+from .constants import SPELL_SEPARATOR, ZENHAN_TABLE
+from .dictionaries import compiledDictionary
+
+
+def _buildNormalizationTable() -> Dict[int, str]:
+    """ZENHAN_TABLEとDIACRITIC_TABLEを順に適用した結果を、1回のstr.translateで得られるテーブルを返す"""
+    diacritics = str.maketrans(constants.DIACRITIC_TABLE)
+    table = dict(diacritics)
+    for char, converted in ZENHAN_TABLE.items():
+        table[ord(char)] = converted.translate(diacritics)
+    return table
+
+
+def _buildSpellTable(separator: str) -> Optional[Dict[int, str]]:
+    """
+    アルファベットの各文字を、読みの後にseparatorを付けた文字列に変換するテーブルを返す（_alphaToSpellで使う）。
+    SPELL辞書に読みのない文字があればNoneを返す。
+    """
+    table = {}
+    for char in string.ascii_letters:
+        kana = dictionaries.SPELL.get(char.upper())
+        if kana is None:
+            return None
+        table[ord(char)] = kana + separator
+    return table
+
+
+# 要素の名前と、その作り方
+_BUILDERS = {
+    "words": lambda: dictionaries.WORDS,
+    "phrases": lambda: dictionaries.PHRASES,
+    "prefix": lambda: dictionaries.PREFIX,
+    "suffix": lambda: dictionaries.SUFFIX,
+    "spell": lambda: dictionaries.SPELL,
+    "upperIgnore": lambda: constants.UPPER_IGNORE,
+    # 全角→半角の変換とアクセント記号の除去を、まとめて行うテーブル
+    "normalizationTable": _buildNormalizationTable,
+    # アルファベットを1文字ずつ読みに変換する（スペルアウトする）テーブル。区切り文字なしと、SPELL_SEPARATORで区切る場合のもの
+    "spellTable": lambda: _buildSpellTable(""),
+    "separatedSpellTable": lambda: _buildSpellTable(SPELL_SEPARATOR),
+    # 複合語分解（_partsToKana）で使うトライ
+    "trie": dictionaryTrie.get,
+    # ローマ字読み（_romanToKana）で使うオートマトン
+    "automaton": romanAutomaton.get,
+    # 単語全体の変換結果の表（_wordToKanaで使う。wordTable.pyを参照）。表がなければNone
+    "wordTable": wordTable.load,
+}
+# SPELL_ALLモードで使う要素
+_SPELL_ONLY = ("normalizationTable", "spell", "spellTable", "separatedSpellTable")
+# 辞書から作る表（memoryReportで使用量を調べる要素）
+_TABLES = ("normalizationTable", "spellTable", "separatedSpellTable", "trie", "automaton", "wordTable")
+
+
+def _memoryUsage(table) -> dictionaries.MemoryUsage:
+    """表tableのメモリの使用量を返す"""
+    if isinstance(table, dictionaryTrie.DictionaryTrie):
+        return dictionaries.MemoryUsage("trie", len(table), None, table.sizeof(), table.mappedSize(), 0)
+    if isinstance(table, romanAutomaton.RomanAutomaton):
+        return dictionaries.MemoryUsage("automaton", len(table), None, table.sizeof(), 0, 0)
+    if isinstance(table, compiledDictionary.CompiledDictionary):
+        # 単語全体の変換結果の表。JSONから読み込むものではなく、登録数も多いため、dictBytesは求めない
+        return dictionaries.MemoryUsage("compiled", len(table), None, table.sizeof(), table.mappedSize(), table.memoSizeof())
+    # str.translateのテーブル（dict）
+    return dictionaries.memoryUsage(table)
+
+
+class ConversionEngine:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        # 作成済みの要素はインスタンスの属性になっているため、ここに来るのは初回の参照時のみ
+        if name not in _BUILDERS:
+            raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+        with self._lock:
+            if name not in self.__dict__:
+                self.__dict__[name] = _BUILDERS[name]()
+        return self.__dict__[name]
+
+    def __dir__(self):
+        return sorted(set(super().__dir__()) | set(_BUILDERS))
+
+    def memoryReport(self) -> Dict[str, dictionaries.MemoryUsage]:
+        """作成済みの表ごとのメモリの使用量を、要素の名前からMemoryUsageへのdictで返す（辞書そのものはdictionaries.memoryReportを参照）"""
+        report = {}
+        for name in _TABLES:
+            table = self.__dict__.get(name)
+            if table is not None:
+                report[name] = _memoryUsage(table)
+        return report
+
+    def preload(self, spellOnly: bool = False) -> None:
+        """すべての要素を作っておく。spellOnlyがTrueなら、SPELL_ALLモードで使う要素だけを作る"""
+        for name in _SPELL_ONLY if spellOnly else _BUILDERS:
+            getattr(self, name)
+
+
+# プロセス内で共有するエンジン（要素は最初に参照されたときに作られるため、作成自体に時間はかからない）
+_engine = ConversionEngine()
+
+
+def get() -> ConversionEngine:
+    """プロセス内で共有するエンジンを返す"""
+    return _engine
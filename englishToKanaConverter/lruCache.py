@@ -0,0 +1,69 @@
+import threading
+from collections import OrderedDict, namedtuple
+
+# キャッシュの統計情報
+# hits: ヒット数, misses: ミス数, evictions: 容量超過で捨てた件数, maxsize: 最大件数, currsize: 現在の件数
+CacheInfo = namedtuple("CacheInfo", ("hits", "misses", "evictions", "maxsize", "currsize"))
+
+# キャッシュに存在しないことを表す
+MISSING = object()
+
+
+class LRUCache:
+    """最大件数を超えると、最も長く使われていないものから捨てるキャッシュ"""
+
+    def __init__(self, maxsize: int) -> None:
+        if maxsize <= 0:
+            raise ValueError(f"maxsize must be positive, not {maxsize}")
+        self._maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key, default=MISSING):
+        """keyに対応する値を返す。存在しなければdefaultを返す"""
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self._misses += 1
+                return default
+            self._data.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key, value) -> None:
+        """keyに対応する値としてvalueを登録する"""
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self._maxsize:
+                self._data.popitem(last=False)
+                self._evictions += 1
+
+    def discard(self, key) -> None:
+        """keyが登録されていれば消去する"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def removeIf(self, predicate) -> int:
+        """predicate(key)がTrueになるものをすべて消去し、消去した件数を返す"""
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                del self._data[key]
+            return len(keys)
+
+    def clear(self) -> None:
+        """登録内容と統計情報を消去する"""
+        with self._lock:
+            self._data.clear()
+            self._hits = 0
+            self._misses = 0
+            self._evictions = 0
+
+    def info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, self._evictions, self._maxsize, len(self._data))
@@ -0,0 +1,213 @@
+# 変換結果の永続キャッシュ
+#
+# processの結果をSQLiteのデータベースファイルに保存し、プロセスを再起動した後も使えるようにする。
+# 結果は、辞書のバージョン（辞書・定数のファイルと本モジュールのソースコードの内容から求めたハッシュ値）ごとに保存し、
+# 異なるバージョンで作った結果は、データベースを開いたときに自動で削除する。
+# WALモードで開くため、同じホスト上の複数のプロセスで1つのファイルを共有できる。
+
+import atexit
+import glob
+import hashlib
+import os
+import sqlite3
+import threading
+import weakref
+from typing import Dict, Iterable, Tuple
+
+from . import dictionaries
+from .conversionMode import ConversionMode
+from .lruCache import MISSING, CacheInfo
+
+_DIR = os.path.dirname(__file__)
+# データベースの形式を変更した場合は必ず増やすこと
+SCHEMA_VERSION = 1
+# putで追加した結果を、まとめてデータベースに書き込む件数
+FLUSH_SIZE = 1000
+# 1回の問い合わせで調べる文字列の数（SQLiteのパラメータ数の上限より小さくすること）
+_QUERY_SIZE = 500
+# 他のプロセスが書き込み中の場合に待つ時間（秒）
+_TIMEOUT = 30.0
+
+_version = None
+_versionLock = threading.Lock()
+
+
+def dictionaryVersion() -> str:
+    """
+    辞書のバージョンを返す（初回の呼び出し時に求める）。
+    辞書と定数のファイル、および本モジュールのソースコードのいずれかが変わると、異なる値になる。
+    """
+    global _version
+    with _versionLock:
+        if _version is None:
+            # 辞書から生成する表（トライなど）は、変換結果に影響しないため含めない
+            paths = dictionaries.sourcePaths()
+            paths += glob.glob(os.path.join(_DIR, "*.py"))
+            digest = hashlib.sha256(f"schema {SCHEMA_VERSION}\n".encode())
+            for path in sorted(paths, key=lambda path: os.path.relpath(path, _DIR)):
+                with open(path, "rb") as f:
+                    content = f.read()
+                digest.update(f"{os.path.relpath(path, _DIR)} {len(content)}\n".encode())
+                digest.update(content)
+            _version = digest.hexdigest()
+        return _version
+
+
+# 開いているキャッシュ（終了時に、書き込んでいない結果を書き込む）
+_openCaches = weakref.WeakSet()
+
+
+@atexit.register
+def _flushAll() -> None:
+    for cache in list(_openCaches):
+        cache.flush()
+
+
+class PersistentCache:
+    """
+    変換結果を保存するSQLiteのデータベース。EnglishToKanaConverterの引数persistentCacheに渡して使う。
+    1つのインスタンスを、複数のEnglishToKanaConverterや複数のスレッドで共有してよい。
+    結果は、変換モードと、ユーザー辞書の内容（variant）ごとに保存する。
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._version = dictionaryVersion()
+        self._lock = threading.Lock()
+        # 書き込んでいない結果（(variant, 変換モードの値, 変換元)から変換結果へのdict）
+        self._pending = {}
+        self._hits = 0
+        self._misses = 0
+        self._pid = None
+        self._connection = None
+        # forkで引き継いだ接続（子プロセスで閉じると親プロセスの接続に影響するため、閉じずに持っておく）
+        self._inherited = []
+        with self._lock:
+            self._connect()
+        _openCaches.add(self)
+
+    def _connect(self) -> sqlite3.Connection:
+        """データベースへの接続を返す。forkで作られた子プロセスでは、接続し直す"""
+        if self._pid == os.getpid():
+            return self._connection
+        if self._connection is not None:
+            self._inherited.append(self._connection)
+            # 書き込んでいない結果は、親プロセスが書き込む
+            self._pending = {}
+        connection = sqlite3.connect(self.path, timeout=_TIMEOUT, isolation_level=None, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            connection.execute("CREATE TABLE IF NOT EXISTS results (version TEXT NOT NULL, variant TEXT NOT NULL, mode INTEGER NOT NULL, source TEXT NOT NULL, result TEXT NOT NULL, PRIMARY KEY (version, variant, mode, source)) WITHOUT ROWID")
+            row = connection.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+            if row is None or row[0] != self._version:
+                # 辞書のバージョンが変わった
+                connection.execute("DELETE FROM results WHERE version != ?", (self._version,))
+                connection.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (self._version,))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            connection.close()
+            raise
+        self._connection = connection
+        self._pid = os.getpid()
+        return connection
+
+    def get(self, s: str, mode: ConversionMode, variant: str = "", default=MISSING):
+        """sをmodeで変換した結果を返す。保存されていなければdefaultを返す"""
+        return self.getMany([s], mode, variant).get(s, default)
+
+    def getMany(self, texts: Iterable[str], mode: ConversionMode, variant: str = "") -> Dict[str, str]:
+        """textsの内、結果が保存されているものについて、変換元から変換結果へのdictを返す"""
+        texts = list(dict.fromkeys(texts))
+        found = {}
+        with self._lock:
+            connection = self._connect()
+            missing = []
+            for s in texts:
+                result = self._pending.get((variant, mode.value, s))
+                if result is not None:
+                    found[s] = result
+                else:
+                    missing.append(s)
+            for i in range(0, len(missing), _QUERY_SIZE):
+                chunk = missing[i:i + _QUERY_SIZE]
+                query = f"SELECT source, result FROM results WHERE version = ? AND variant = ? AND mode = ? AND source IN ({','.join('?' * len(chunk))})"
+                found.update(connection.execute(query, (self._version, variant, mode.value, *chunk)))
+            self._hits += len(found)
+            self._misses += len(texts) - len(found)
+        return found
+
+    def put(self, s: str, mode: ConversionMode, result: str, variant: str = "") -> None:
+        """sをmodeで変換した結果resultを追加する。データベースへは、FLUSH_SIZE件たまるか、flushを呼んだときにまとめて書き込む"""
+        with self._lock:
+            self._connect()
+            self._pending[(variant, mode.value, s)] = result
+            if len(self._pending) >= FLUSH_SIZE:
+                self._flush()
+
+    def putMany(self, results: Iterable[Tuple[str, str]], mode: ConversionMode, variant: str = "") -> None:
+        """(変換元, 変換結果)のイテラブルresultsを、すぐにデータベースに書き込む"""
+        with self._lock:
+            self._connect()
+            for s, result in results:
+                self._pending[(variant, mode.value, s)] = result
+            self._flush()
+
+    def flush(self) -> None:
+        """追加した結果を、データベースに書き込む"""
+        with self._lock:
+            if self._connection is not None and self._pid == os.getpid():
+                self._flush()
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        connection = self._connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)", ((self._version, variant, mode, s, result) for (variant, mode, s), result in self._pending.items()))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        self._pending = {}
+
+    def clear(self) -> None:
+        """保存されているすべての結果を削除する"""
+        with self._lock:
+            connection = self._connect()
+            self._pending = {}
+            connection.execute("DELETE FROM results")
+
+    def close(self) -> None:
+        """追加した結果を書き込み、データベースを閉じる"""
+        with self._lock:
+            if self._connection is not None:
+                if self._pid == os.getpid():
+                    self._flush()
+                    self._connection.close()
+                else:
+                    self._inherited.append(self._connection)
+            self._connection = None
+            self._pid = None
+        _openCaches.discard(self)
+
+    def __enter__(self) -> "PersistentCache":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        """現在の辞書のバージョンで保存されている結果の数"""
+        with self._lock:
+            connection = self._connect()
+            self._flush()
+            return connection.execute("SELECT COUNT(*) FROM results WHERE version = ?", (self._version,)).fetchone()[0]
+
+    def info(self) -> CacheInfo:
+        """統計情報を返す（maxsizeは常にNone）"""
+        return CacheInfo(self._hits, self._misses, 0, None, len(self))
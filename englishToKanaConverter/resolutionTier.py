@@ -0,0 +1,16 @@
+from enum import Enum
+
+
+class ResolutionTier(Enum):
+    """単語を読むのに使われた手段"""
+
+    # 単語全体がWORDS辞書に一致した
+    WORDS = 0
+    # PHRASES辞書の単語（またはその組み合わせ）として読めた
+    PHRASES = 1
+    # PHRASES辞書の単語に、接頭語（PREFIX）や接尾語（SUFFIX）を組み合わせて読めた
+    AFFIX = 2
+    # ローマ字として読めた
+    ROMAN = 3
+    # 読めなかった（STANDARDではスペルアウトされ、KEEP_UNREADABLEではそのまま残る）
+    UNRESOLVED = 4
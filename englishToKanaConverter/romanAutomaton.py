@@ -0,0 +1,121 @@
+# ローマ字読み（_romanToKana）で使うオートマトン
+#
+# ROMAN辞書のキーを1文字ずつたどる決定性の状態遷移として構築しておき、単語を先頭から1回走査するだけで変換する。
+# 変換規則（促音の判定、1文字のキーがあれば一致が途切れるまで伸ばし、なければ最長のキーを探す）は、従来の辞書引きによる実装と同じ。
+
+import sys
+import threading
+from typing import Callable, List, Optional
+
+from . import dictionaries
+from .constants import SOKUON_IGNORE
+
+
+class _State:
+    __slots__ = ("transitions", "value")
+
+    def __init__(self) -> None:
+        # 次の文字から、遷移先の状態へのdict
+        self.transitions = {}
+        # この状態までの文字列がキーであれば、その読み（キーでなければNone）
+        self.value = None
+
+
+class RomanAutomaton:
+    def __init__(self, roman) -> None:
+        """roman: ローマ字（大文字）から読みへのdict"""
+        self._start = _State()
+        for key, value in roman.items():
+            if not value:
+                # 読みが空のキーは、存在しないものとして扱う
+                continue
+            state = self._start
+            for char in key:
+                state = state.transitions.setdefault(char, _State())
+            state.value = value
+
+    def _states(self) -> List[_State]:
+        """すべての状態のリスト"""
+        states = [self._start]
+        for state in states:
+            states.extend(state.transitions.values())
+        return states
+
+    def __len__(self) -> int:
+        """状態の数"""
+        return len(self._states())
+
+    def sizeof(self) -> int:
+        """すべての状態と遷移、読みの文字列のバイト数"""
+        return sum(sys.getsizeof(state) + sys.getsizeof(state.transitions) + (sys.getsizeof(state.value) if state.value is not None else 0) for state in self._states())
+
+    def convert(self, word: str) -> Optional[str]:
+        """大文字の単語wordをローマ字として読んだ結果を返す。読めない場合はNoneを返す"""
+        result = []
+        if not self._scan(word, result.append):
+            return None
+        return "".join(result)
+
+    def accepts(self, word: str) -> bool:
+        """大文字の単語wordをローマ字として読めればTrueを返す（読みの文字列は作らない）"""
+        return self._scan(word, _discard)
+
+    def _scan(self, word: str, emit: Callable[[str], None]) -> bool:
+        """大文字の単語wordを先頭から走査し、読みを順にemitに渡す。読めなければ途中でFalseを返す"""
+        start = self._start
+        length = len(word)
+        index = 0
+        while index < length:
+            char = word[index]
+            # 促音の判定（母音やNの連続は促音にしない）
+            if index + 1 < length and char == word[index + 1] and char not in SOKUON_IGNORE:
+                emit("ッ")
+                index += 1
+                continue
+            state = start.transitions.get(char)
+            if state is not None and state.value is not None:
+                # 1文字のキーがあれば、キーの一致が途切れるまで伸ばす
+                found = state.value
+                index += 1
+                while index < length:
+                    state = state.transitions.get(word[index])
+                    if state is None or state.value is None:
+                        break
+                    found = state.value
+                    index += 1
+                emit(found)
+                continue
+            # 1文字のキーがなければ、2文字以上で最長のキーを探す
+            found = None
+            end = index + 1
+            position = index + 1
+            while state is not None and position < length:
+                state = state.transitions.get(word[position])
+                position += 1
+                if state is not None and state.value is not None:
+                    found = state.value
+                    end = position
+            if found is None:
+                # 変換できなかった
+                return False
+            emit(found)
+            index = end
+        return True
+
+
+def _discard(value: str) -> None:
+    pass
+
+
+_automaton = None
+_lock = threading.Lock()
+
+
+def get() -> RomanAutomaton:
+    """ROMAN辞書から構築したオートマトンを返す（初回の呼び出し時に構築する）"""
+    global _automaton
+    if _automaton is None:
+        with _lock:
+            if _automaton is None:
+                _automaton = RomanAutomaton(dictionaries.ROMAN)
+    return _automaton
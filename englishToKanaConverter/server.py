@@ -0,0 +1,145 @@
+# 常駐して変換を行うサーバー
+#
+# Unixドメインソケット、またはlocalhostのTCPで接続を受け付け、1行1件のJSON（NDJSON）で変換の要求と結果をやり取りする。
+#   要求: {"id": 任意の値, "text": "変換する文字列", "mode": "STANDARD"}（idとmodeは省略可。modeはConversionModeの名前）
+#   応答: {"id": 要求のid, "result": "変換結果"}、またはエラーの場合は{"id": 要求のid, "error": "エラーメッセージ"}
+# 応答は、接続ごとに要求と同じ順序で返す。クライアントは応答を待たずに続けて要求を送ってよい（パイプライン化）。
+# 起動方法: python -m englishToKanaConverter.server --unix ソケットのパス、またはpython -m englishToKanaConverter.server --port ポート番号
+
+import argparse
+import asyncio
+import json
+import os
+import stat
+import sys
+from typing import Any, Dict, Union
+
+from . import preload
+from .conversionMode import ConversionMode
+from .englishToKanaConverter import EnglishToKanaConverter
+
+# 1件の要求の最大の長さ（バイト）
+LINE_LIMIT = 16 * 1024 * 1024
+# これより長い要求は、変換中に他の接続の処理が止まらないよう、別のスレッドで処理する（バイト）
+THREAD_THRESHOLD = 64 * 1024
+
+
+def handleRequest(converter: EnglishToKanaConverter, line: Union[bytes, str], defaultMode: ConversionMode = ConversionMode.STANDARD) -> Dict[str, Any]:
+    """1行の要求lineを処理し、応答をdictで返す。要求でmodeを省略した場合は、defaultModeで変換する"""
+    requestId = None
+    try:
+        request = json.loads(line)
+        if not isinstance(request, dict):
+            raise ValueError("request must be a JSON object")
+        requestId = request.get("id")
+        text = request["text"]
+        if not isinstance(text, str):
+            raise ValueError("text must be a string")
+        modeName = request.get("mode", defaultMode.name)
+        if not isinstance(modeName, str) or modeName not in ConversionMode.__members__:
+            raise ValueError(f"unknown mode: {modeName}")
+        return {"id": requestId, "result": converter.process(text, ConversionMode[modeName])}
+    except KeyError as e:
+        return {"id": requestId, "error": f"missing field: {e.args[0]}"}
+    except ValueError as e:
+        return {"id": requestId, "error": str(e)}
+    except Exception as e:
+        # 1件の要求の失敗で、接続（後続の要求）を巻き込まないよう、エラーの応答にする
+        return {"id": requestId, "error": f"internal error: {type(e).__name__}: {e}"}
+
+
+def formatResponse(response: Dict[str, Any], encoding: str = "utf-8") -> str:
+    """応答responseを、改行付きの1行のJSONにする。文字コードencodingで表せない文字（対になっていないサロゲートなど）を含む場合は、エスケープする"""
+    text = json.dumps(response, ensure_ascii=False)
+    try:
+        text.encode(encoding)
+    except UnicodeEncodeError:
+        text = json.dumps(response)
+    return text + "\n"
+
+
+class ConversionServer:
+    def __init__(self, converter: EnglishToKanaConverter = None) -> None:
+        if converter is None:
+            converter = EnglishToKanaConverter()
+        self.converter = converter
+
+    def _respond(self, line: bytes) -> bytes:
+        return formatResponse(handleRequest(self.converter, line)).encode("utf-8")
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # 要求が長すぎる
+                    writer.write(json.dumps({"id": None, "error": "request too long"}).encode("utf-8") + b"\n")
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                if len(line) > THREAD_THRESHOLD:
+                    # 応答を待ってから次の要求を読むため、別のスレッドで処理しても応答の順序は変わらない
+                    response = await asyncio.get_running_loop().run_in_executor(None, self._respond, line)
+                else:
+                    response = self._respond(line)
+                writer.write(response)
+                # 書き込みが溜まっている場合だけ待つ
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def startUnix(self, path: str) -> asyncio.AbstractServer:
+        """Unixドメインソケットpathで接続の受け付けを開始する。pathにソケット以外のファイルがあればFileExistsError"""
+        try:
+            mode = os.lstat(path).st_mode
+        except FileNotFoundError:
+            pass
+        else:
+            # 以前に起動したサーバーが残したソケットだけを削除する（指定の誤りで通常のファイルなどを消さないよう）
+            if not stat.S_ISSOCK(mode):
+                raise FileExistsError(f"{path} exists and is not a socket")
+            os.unlink(path)
+        return await asyncio.start_unix_server(self._handle, path, limit=LINE_LIMIT)
+
+    async def startTcp(self, host: str = "127.0.0.1", port: int = 0) -> asyncio.AbstractServer:
+        """TCPのhost:portで接続の受け付けを開始する"""
+        return await asyncio.start_server(self._handle, host, port, limit=LINE_LIMIT)
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    server = ConversionServer()
+    if args.unix:
+        listener = await server.startUnix(args.unix)
+        sys.stderr.write(f"listening on {args.unix}\n")
+    else:
+        listener = await server.startTcp(args.host, args.port)
+        host, port = listener.sockets[0].getsockname()[:2]
+        sys.stderr.write(f"listening on {host}:{port}\n")
+    async with listener:
+        await listener.serve_forever()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m englishToKanaConverter.server", description="英語→カナ変換サーバー")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--unix", help="接続を受け付けるUnixドメインソケットのパス")
+    group.add_argument("--port", type=int, help="接続を受け付けるTCPのポート番号")
+    parser.add_argument("--host", default="127.0.0.1", help="接続を受け付けるTCPのアドレス（既定値: 127.0.0.1）")
+    args = parser.parse_args(argv)
+    # 最初の要求が遅くならないよう、辞書などを読み込んでおく
+    preload()
+    try:
+        asyncio.run(_serve(args))
+    except FileExistsError as e:
+        parser.error(str(e))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# 変換の追跡
+#
+# EnglishToKanaConverterの引数tracerにTracerを渡すと、各処理段階の実行時間と、各単語を読むのに使われた手段が通知される。
+# tracerを渡さない場合は追跡のための処理は一切行われないため、変換の速度には影響しない。
+
+import logging
+import time
+from typing import Dict, Tuple
+
+from .resolutionTier import ResolutionTier
+
+# 実行時間を計測する処理段階（EnglishToKanaConverterのメソッド名）
+STAGES = (
+    "_normalize",
+    "_splitUpperCase",
+    "_engToKana",
+    "_partsToKana",
+    "_romanToKana",
+    "_alphaToSpell",
+)
+
+
+class Tracer:
+    """追跡用のフック。必要なメソッドだけを上書きして使う"""
+
+    def stage(self, name: str, elapsed: float, args: tuple, result) -> None:
+        """
+        処理段階nameが終わった。elapsedは実行時間（秒）、argsは引数、resultは戻り値。
+        処理段階は入れ子になる（_engToKanaの中で_partsToKanaが呼ばれるなど）ため、elapsedには内側の処理段階の時間も含まれる。
+        """
+
+    def resolved(self, word: str, tier: ResolutionTier) -> None:
+        """
+        単語wordを読むのに、tierの手段が使われた。
+        キャッシュから結果を返した単語については通知されない。
+        """
+
+
+class LoggingTracer(Tracer):
+    """追跡した内容をログに出力する"""
+
+    def __init__(self, log: logging.Logger) -> None:
+        self.log = log
+
+    def stage(self, name, elapsed, args, result):
+        self.log.debug(f"{name.lstrip('_')}: {args} -> {result!r} ({elapsed * 1000:.3f}ms)")
+
+    def resolved(self, word, tier):
+        self.log.debug(f"resolved by {tier.name}: {word}")
+
+
+class StageProfiler(Tracer):
+    """処理段階ごとの実行時間と呼び出し回数、および手段ごとの単語数を集計する"""
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        # 処理段階の名前から、(呼び出し回数, 合計の実行時間)へのdict
+        self.stages = {name: (0, 0.0) for name in STAGES}
+        # 手段から、単語数へのdict
+        self.tiers = {tier: 0 for tier in ResolutionTier}
+
+    def stage(self, name, elapsed, args, result):
+        count, total = self.stages.get(name, (0, 0.0))
+        self.stages[name] = (count + 1, total + elapsed)
+
+    def resolved(self, word, tier):
+        self.tiers[tier] += 1
+
+    def report(self) -> Dict[str, Tuple[int, float]]:
+        """処理段階の名前から、(呼び出し回数, 合計の実行時間)へのdictを返す"""
+        return dict(self.stages)
+
+    def summary(self) -> str:
+        """集計結果を、人が読める形式の文字列で返す"""
+        lines = []
+        for name, (count, total) in self.stages.items():
+            average = total / count * 1000000 if count else 0
+            lines.append(f"{name:20} {count:10}回 {total:10.4f}秒 （平均{average:.1f}マイクロ秒）")
+        for tier, count in self.tiers.items():
+            lines.append(f"{tier.name:20} {count:10}語")
+        return "\n".join(lines)
+
+
+def traced(name: str, method, tracer: Tracer):
+    """methodを、実行時間をtracerに通知するように包んだ関数を返す"""
+    perfCounter = time.perf_counter
+
+    def wrapper(*args, **kwargs):
+        start = perfCounter()
+        result = method(*args, **kwargs)
+        tracer.stage(name, perfCounter() - start, args, result)
+        return result
+
+    return wrapper
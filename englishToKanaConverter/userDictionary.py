@@ -0,0 +1,119 @@
+# ユーザー辞書
+#
+# 本体の辞書（WORDS, PHRASES）に重ねて使う辞書。本体の辞書はコピーせず、ユーザー辞書の内容だけを別に保持する。
+# ユーザー辞書は複数重ねることができ、後から追加したものほど優先される。いずれのユーザー辞書も本体の辞書より優先される。
+
+import hashlib
+import json
+import re
+from typing import Dict, Iterable, Mapping, Optional, Set, Tuple
+
+from . import dictionaryTrie
+
+# ユーザー辞書のキーとして使える文字列（大文字に変換した後）
+_KEY_PATTERN = re.compile("[A-Z']+")
+
+
+def _normalizeEntries(entries: Optional[Mapping[str, str]]) -> Dict[str, str]:
+    """辞書のキーを大文字にしたdictを返す。キーに使えない文字が含まれていればValueError"""
+    result = {}
+    if entries is None:
+        return result
+    for key, value in entries.items():
+        upper = key.upper()
+        if not _KEY_PATTERN.fullmatch(upper):
+            raise ValueError(f"invalid key: {key!r} (only alphabets and apostrophes are allowed)")
+        if not isinstance(value, str) or not value:
+            raise ValueError(f"invalid value for {key!r}: {value!r}")
+        result[upper] = value
+    return result
+
+
+class UserDictionary:
+    """1つのユーザー辞書"""
+
+    def __init__(self, name: str, words: Optional[Mapping[str, str]] = None, phrases: Optional[Mapping[str, str]] = None, path: Optional[str] = None) -> None:
+        """
+        words: WORDSと同様に、単語全体が一致した場合にだけ使う辞書
+        phrases: PHRASESと同様に、複合語の部品としても使う辞書
+        path: 読み込み元のファイル（loadで読み込んだ場合）
+        """
+        self.name = name
+        self.words = _normalizeEntries(words)
+        self.phrases = _normalizeEntries(phrases)
+        self.path = path
+
+    @classmethod
+    def load(cls, name: str, path: str) -> "UserDictionary":
+        """
+        JSONファイルpathからユーザー辞書を読み込む。
+        ファイルの内容は{"words": {"キー": "読み", ...}, "phrases": {"キー": "読み", ...}}の形式で、wordsとphrasesはどちらも省略できる。
+        """
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, dict) or not set(data) <= {"words", "phrases"}:
+            raise ValueError(f"{path}: user dictionary must be an object with \"words\" and/or \"phrases\"")
+        return cls(name, data.get("words"), data.get("phrases"), path)
+
+
+def _changedKeys(old: Dict[str, str], new: Dict[str, str]) -> Set[str]:
+    """oldとnewとで、追加、削除、または値が変更されたキーを返す"""
+    return {key for key in old.keys() | new.keys() if old.get(key) != new.get(key)}
+
+
+class DictionaryLayers:
+    """
+    重ねて使うユーザー辞書の一覧。作成後は変更せず、ユーザー辞書を変更する際は新しく作って置き換える。
+    各ユーザー辞書を優先順位に従ってまとめた辞書と、PHRASESの部品として使うキーのトライを持つ。
+    """
+
+    def __init__(self, dictionaries: Tuple[UserDictionary, ...] = ()) -> None:
+        # 優先順位の低い順
+        self.dictionaries = dictionaries
+        self.words = {}
+        self.phrases = {}
+        for dictionary in dictionaries:
+            self.words.update(dictionary.words)
+            self.phrases.update(dictionary.phrases)
+        self.trie = dictionaryTrie.build(((self.phrases, dictionaryTrie.PHRASE),))
+        # 内容から求めたハッシュ値（永続キャッシュで、ユーザー辞書の内容ごとに結果を分けるのに使う）
+        self.digest = hashlib.sha256(json.dumps([self.words, self.phrases], ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def names(self) -> Tuple[str, ...]:
+        return tuple(dictionary.name for dictionary in self.dictionaries)
+
+    def replaced(self, dictionary: UserDictionary) -> "DictionaryLayers":
+        """同じ名前のユーザー辞書をdictionaryに置き換えた一覧を返す。同じ名前のものがなければ、最も優先される位置に追加する"""
+        dictionaries = list(self.dictionaries)
+        for i, current in enumerate(dictionaries):
+            if current.name == dictionary.name:
+                dictionaries[i] = dictionary
+                break
+        else:
+            dictionaries.append(dictionary)
+        return DictionaryLayers(tuple(dictionaries))
+
+    def removed(self, name: str) -> "DictionaryLayers":
+        """名前がnameのユーザー辞書を除いた一覧を返す。存在しなければKeyError"""
+        if name not in self.names():
+            raise KeyError(name)
+        return DictionaryLayers(tuple(dictionary for dictionary in self.dictionaries if dictionary.name != name))
+
+    def get(self, name: str) -> UserDictionary:
+        """名前がnameのユーザー辞書を返す。存在しなければKeyError"""
+        for dictionary in self.dictionaries:
+            if dictionary.name == name:
+                return dictionary
+        raise KeyError(name)
+
+    def changedKeys(self, other: "DictionaryLayers") -> Tuple[Set[str], Set[str]]:
+        """otherと比べて、変換結果が変わりうるWORDSのキーとPHRASESのキーを返す"""
+        return _changedKeys(self.words, other.words), _changedKeys(self.phrases, other.phrases)
+
+
+def keyPattern(keys: Iterable[str]) -> Optional["re.Pattern"]:
+    """keysのいずれかを含む文字列に一致する正規表現を返す（keysが空ならNone）"""
+    keys = sorted(keys, key=len, reverse=True)
+    if not keys:
+        return None
+    return re.compile("|".join(map(re.escape, keys)))
@@ -0,0 +1,73 @@
+# 単語全体の変換結果の表
+#
+# 辞書の単語（WORDSとPHRASESのキー）と、PHRASESのキーに接頭語・接尾語を付けた単語について、_wordToKanaの変換結果をあらかじめ求めておいたもの。
+# 変換時は、ほとんどの単語がこの表を1回検索するだけで変換でき、表にない単語（複合語など）だけを_partsToKanaで分解する。
+# 表はtools/optimizeDic.pyでコンパイル済み辞書（dictionaries/compiledDictionary.pyを参照）の形式で生成し、メモリマップして使う。
+# 値は、単語を読むのに使われる手段（ResolutionTier）の値を表す1文字の後に、変換結果を続けたもの。
+# 手段も表に持つため、表を使っても、tracerへの通知やanalyzeの分類は表を使わない場合と変わらない。
+# 元になった辞書や定数のファイルと一致しない（古い）表は使わず、表がなくても変換結果は変わらない。
+# ユーザー辞書を使っている場合は、ユーザー辞書によって単語の分け方が変わることがあるため、表を使わない。
+
+import os
+import warnings
+
+from . import dictionaries
+from .dictionaries import compiledDictionary
+from .resolutionTier import ResolutionTier
+
+_DIR = os.path.dirname(__file__)
+PATH = os.path.join(_DIR, "dictionaries", "wordTable.bin")
+# 単語の変換方法（_wordToKanaや_partsToKanaなど）を変換結果が変わるように変更した場合と、表の値の形式を変更した場合は必ず増やすこと
+TABLE_VERSION = 2
+
+
+def sourceDigest() -> bytes:
+    """表の元になる辞書と定数のハッシュ値"""
+    return dictionaries.sourceDigest(f"wordTable {TABLE_VERSION}")
+
+
+def load():
+    """表を読み込む。表がない、または古い場合はNoneを返す"""
+    table = compiledDictionary.loadMapping(PATH, sourceDigest())
+    if table is None and os.path.isfile(PATH):
+        warnings.warn(f"{os.path.basename(PATH)}が辞書と一致しないため使用しません。tools/optimizeDic.pyを実行してください。", RuntimeWarning)
+    return table
+
+
+def candidates(words, phrases, prefixes, suffixes):
+    """
+    表に登録する単語の候補（大文字）を返す。
+    接頭語と接尾語の両方を付けた単語はまれな一方で、組み合わせの数が多く表が大きくなるため、候補に含めない。
+    """
+    result = set(words)
+    result.update(phrases)
+    for phrase in phrases:
+        for suffix in suffixes:
+            result.add(phrase + suffix)
+        for prefix in prefixes:
+            result.add(prefix + phrase)
+    return sorted(result)
+
+
+def build(path: str = PATH) -> int:
+    """表を作ってpathに保存し、登録した単語の数を返す"""
+    # 循環importを避けるため、ここでimportする
+    from . import engine
+    from .englishToKanaConverter import EnglishToKanaConverter, _partsTier
+
+    converter = EnglishToKanaConverter()
+    words = engine.get().words
+    table = {}
+    for word in candidates(words, engine.get().phrases, engine.get().prefix, engine.get().suffix):
+        # _wordToKanaと同じ順序で辞書を引く。表を使わずに変換するため、_wordToKanaは呼ばない
+        val = words.get(word)
+        if val is not None:
+            table[word] = f"{ResolutionTier.WORDS.value}{val}"
+            continue
+        choice, choices = converter._chooseParts(word, True, None)
+        if choice is None:
+            continue
+        success, val, remaining = converter._partsToKana(word)
+        table[word] = f"{_partsTier(choice, choices, len(word)).value}{val}"
+    compiledDictionary.buildMapping(table, path, sourceDigest())
+    return len(table)
@@ -0,0 +1,368 @@
+# 変換速度などのベンチマーク
+#
+# 複数の種類の入力（ワークロード）について、モジュールの読み込み時間、辞書の読み込み時間、変換モードごとの変換時間、
+# メモリの使用量、処理段階ごとの実行時間を計測する。
+# --updateを付けて実行すると、計測結果を基準値としてBASELINE_FILEに保存する。
+# 基準値が保存されている場合は、計測結果を基準値と比較し、TOLERANCE倍を超えて悪化した項目があれば終了コード1で終了する。
+# 読めない長い文字列の変換時間の上限（TIME_LIMIT）と、文書の大きさに対する線形性（SCALING_LIMIT）は、基準値とは別に常に確認する。
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+# englishToKanaConverter moduleのimportを可能にする
+sys.path.append(os.getcwd())
+
+from englishToKanaConverter import ConversionMode, EnglishToKanaConverter, dictionaries
+from englishToKanaConverter.tracer import StageProfiler
+
+# 基準値を保存するファイル
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+# 計測結果が基準値の何倍を超えたら悪化とみなすか
+TOLERANCE = 1.5
+# 時間の計測結果がこの秒数未満しか悪化していなければ、誤差とみなす
+NOISE_SECONDS = 0.005
+# 変換時間の計測を繰り返す回数（最も速かった結果を使う）
+REPEAT = 3
+# 別プロセスでの読み込み時間の計測を繰り返す回数（最も速かった結果を使う）
+COLD_REPEAT = 5
+# ワークロードの文書の大きさ（文字数）
+WORKLOAD_SIZE = 50000
+# 辞書から取り出す単語数
+WORD_LIST_SIZE = 5000
+# 1件の変換にかかってよい最大の秒数
+TIME_LIMIT = 1.0
+# 線形性の確認に使う文書の大きさ（文字数）
+SCALING_SIZES = (25000, 50000, 100000, 200000, 400000)
+# 最も小さい文書と最も大きい文書とで、1文字あたりの変換時間が何倍まで増えてよいか
+# （変換時間が文書の大きさに比例すれば1倍、2乗に比例すれば文書の大きさの比と同じ倍率になる）
+SCALING_LIMIT = 2.0
+
+# 別プロセスで、モジュールの読み込み、辞書の読み込み、最初の変換にかかる時間を計測するプログラム
+_COLD_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import englishToKanaConverter
+imported = time.perf_counter()
+englishToKanaConverter.preload()
+loaded = time.perf_counter()
+englishToKanaConverter.EnglishToKanaConverter().process("hello")
+converted = time.perf_counter()
+print(json.dumps({"import": imported - start, "load": loaded - imported, "first": converted - loaded}))
+"""
+
+# 別プロセスで、辞書の読み込みから文書の変換までのメモリ使用量の最大値を計測するプログラム
+_MEMORY_SCRIPT = """
+import json, sys, tracemalloc
+tracemalloc.start()
+sys.path.insert(0, "tools")
+import englishToKanaConverter
+from benchmark import document
+englishToKanaConverter.preload()
+loaded = tracemalloc.get_traced_memory()[0]
+englishToKanaConverter.EnglishToKanaConverter().process(document(%d))
+current, peak = tracemalloc.get_traced_memory()
+print(json.dumps({"loaded": loaded, "peak": peak}))
+"""
+
+
+def pathologicalInputs():
+    """
+    読めない長い文字列など、変換に時間がかかりやすい入力を返す。
+    結果が再現できるよう、乱数の種は固定する。
+    """
+    rand = random.Random(0)
+    inputs = []
+    # 辞書の短い単語が繰り返され、分割のしかたが多数ある上に、最後まで変換できない文字列
+    for unit in ("do", "we", "dum", "don"):
+        inputs.append(unit * 40 + "q")
+    # ハッシュ値やbase64など、ランダムな英数字の並び
+    inputs.append("".join(rand.choice("0123456789abcdef") for _ in range(64)))
+    base64Chars = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+    inputs.append("".join(rand.choice(base64Chars) for _ in range(4096)))
+    inputs.append("".join(rand.choice(base64Chars[:52]) for _ in range(4096)))
+    # 区切りのない長い識別子
+    inputs.append("".join(rand.choice(("get", "set", "value", "on", "do", "we")) for _ in range(1000)) + "q")
+    # 同じ文字の連続
+    inputs.append("a" * 10000)
+    inputs.append("do" * 5000 + "q")
+    return inputs
+
+
+def _join(words, size, seed=0):
+    """wordsからランダムに選んだ単語を、日本語の区切りなどを挟みながらsize文字になるまで並べる"""
+    rand = random.Random(seed)
+    parts = []
+    length = 0
+    while length < size:
+        part = rand.choice(words) + rand.choice((" ", "、", "です。", "\n"))
+        parts.append(part)
+        length += len(part)
+    return "".join(parts)[:size]
+
+
+def document(size):
+    """英語と日本語が混在した、size文字の文書を返す"""
+    return _join(("Hello", "world", "iPhone", "XMLHttpRequest", "tanaka", "COVID-19", "unhappy", "podcasting", "NHK", "it's", "ｗｏｒｌｄ", "Rocío", "abc"), size)
+
+
+def uiStrings():
+    """メニューやボタンなど、アプリケーションの画面に表示される短い文字列を返す"""
+    strings = (
+        "File", "Edit", "View", "Help", "OK", "Cancel", "Apply", "Close", "Save", "Save As...",
+        "Open Recent", "Preferences", "Settings", "Check for updates", "About", "Exit", "Undo", "Redo",
+        "Cut", "Copy", "Paste", "Select All", "Find and Replace", "Go to line", "Zoom In", "Zoom Out",
+        "Full Screen", "Sign in", "Sign out", "Download", "Upload", "Refresh", "Delete", "Rename",
+        "New Folder", "Properties", "Print Preview", "Page Setup", "Keyboard Shortcuts", "Report a bug",
+        "Wi-Fi", "Bluetooth", "USB", "Airplane mode", "Battery saver", "Night light", "Do not disturb",
+        "ファイル(F)", "編集(E)", "Microsoft Edge", "Google Chrome", "Visual Studio Code", "NVDA",
+    )
+    # 同じ文字列が続けて変換されることはまれなため、大文字小文字を変えたものを混ぜる
+    return [s for s in strings] + [s.upper() for s in strings] + [s.lower() for s in strings]
+
+
+def upperCaseText(size):
+    """大文字の略語や、大文字で区切られた識別子が多い、size文字の文書を返す（_splitUpperCaseの負荷が高い）"""
+    return _join(("NHK", "HTTP", "HTTPS", "XMLHttpRequest", "JSONParser", "IBMWatson", "USBメモリ", "CPU", "GPUDriver", "HTMLElement", "getElementById", "ABCDEFG", "NASA", "IoT", "macOS", "WAVFile", "OK", "PDFをDLする"), size, 1)
+
+
+def romanText(size):
+    """ローマ字で書かれた日本語が多い、size文字の文書を返す（_romanToKanaの負荷が高い）"""
+    return _join(("tanaka", "suzuki", "takahashi", "watanabe", "konnichiwa", "arigatou", "sayonara", "shinkansen", "ryokan", "onsen", "kawaii", "yoroshiku", "ganbatte", "itadakimasu", "shouganai", "kyouto", "oosaka", "hokkaidou", "matcha", "senpai"), size, 2)
+
+
+def wordList():
+    """辞書に登録されている単語から、WORD_LIST_SIZE語を取り出して返す"""
+    keys = sorted(list(dictionaries.WORDS) + list(dictionaries.PHRASES))
+    step = max(1, len(keys) // WORD_LIST_SIZE)
+    return [key.lower() for key in keys[::step]][:WORD_LIST_SIZE]
+
+
+def workloads():
+    """ワークロードの名前から、変換する文字列のリストへのdictを返す"""
+    return {
+        "ui": uiStrings(),
+        "document": [document(WORKLOAD_SIZE)],
+        "upper": [upperCaseText(WORKLOAD_SIZE)],
+        "roman": [romanText(WORKLOAD_SIZE)],
+        "pathological": pathologicalInputs(),
+        "words": wordList(),
+    }
+
+
+def _runScript(script):
+    """pythonの別プロセスでscriptを実行し、出力されたJSONを返す"""
+    output = subprocess.run([sys.executable, "-c", script], cwd=os.getcwd(), check=True, stdout=subprocess.PIPE).stdout
+    return json.loads(output)
+
+
+def measureCold():
+    """別プロセスで、モジュールの読み込み、辞書の読み込み、最初の変換にかかる時間を計測する"""
+    results = [_runScript(_COLD_SCRIPT) for _ in range(COLD_REPEAT)]
+    metrics = {}
+    for key in ("import", "load", "first"):
+        metrics[f"cold.{key}.seconds"] = min(result[key] for result in results)
+    return metrics
+
+
+def measureMemory():
+    """辞書の読み込み後のメモリ使用量と、文書の変換中のメモリ使用量の最大値を計測する"""
+    result = _runScript(_MEMORY_SCRIPT % WORKLOAD_SIZE)
+    metrics = {
+        "memory.loaded.bytes": result["loaded"],
+        "memory.peak.bytes": result["peak"],
+    }
+    # 辞書などを読み込んだ状態で、変換そのものが一時的に使うメモリ
+    c = EnglishToKanaConverter()
+    c.process("hello")
+    s = document(WORKLOAD_SIZE)
+    tracemalloc.start()
+    c.process(s)
+    metrics["memory.conversion.bytes"] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return metrics
+
+
+def measureThroughput(c, loads):
+    """ワークロードと変換モードごとに、すべての文字列の変換にかかる時間を計測する"""
+    metrics = {}
+    for name, texts in loads.items():
+        length = sum(map(len, texts))
+        for mode in ConversionMode:
+            best = None
+            for _ in range(REPEAT):
+                gc.collect()
+                start = time.perf_counter()
+                for s in texts:
+                    c.process(s, mode)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            metrics[f"throughput.{name}.{mode.name}.seconds"] = best
+            print(f"{name:14} {mode.name:16} {best:8.4f}秒 {length / best:12.0f}文字/秒")
+    return metrics
+
+
+def measureStages(loads):
+    """ワークロードごとに、標準の変換モードでの処理段階ごとの実行時間の合計を計測する（REPEAT回のうち最も速かった結果を使う）"""
+    metrics = {}
+    profiler = StageProfiler()
+    c = EnglishToKanaConverter(tracer=profiler)
+    for name, texts in loads.items():
+        best = {}
+        for _ in range(REPEAT):
+            profiler.reset()
+            gc.collect()
+            for s in texts:
+                c.process(s)
+            for stage, (count, total) in profiler.report().items():
+                best[stage] = min(best.get(stage, total), total)
+        print(f"[{name}]")
+        print(profiler.summary())
+        for stage, total in best.items():
+            metrics[f"stage.{name}.{stage}.seconds"] = total
+    return metrics
+
+
+def checkPathological(c):
+    """読めない長い文字列などの変換が、TIME_LIMIT秒以内に終わるかを調べる。超えた件数を返す"""
+    failed = 0
+    for s in pathologicalInputs():
+        for mode in ConversionMode:
+            start = time.perf_counter()
+            c.process(s, mode)
+            elapsed = time.perf_counter() - start
+            label = s if len(s) <= 20 else f"{s[:20]}...（{len(s)}文字）"
+            print(f"{mode.name:16} {elapsed:8.4f}秒 {label}")
+            if elapsed > TIME_LIMIT:
+                failed += 1
+    if failed:
+        sys.stderr.write(f"{failed}件の変換が{TIME_LIMIT}秒を超えました。\n")
+    return failed
+
+
+def checkScaling(c):
+    """
+    文書の大きさに対して、変換時間が線形に増えるかを調べる。基準を超えた変換モードの数を返す。
+    各大きさについてREPEAT回のうち最も速かった結果を使い、最も小さい文書と最も大きい文書の1文字あたりの変換時間を比べる。
+    """
+    failed = 0
+    for mode in ConversionMode:
+        times = []
+        for size in SCALING_SIZES:
+            s = document(size)
+            best = None
+            for _ in range(REPEAT):
+                gc.collect()
+                start = time.perf_counter()
+                c.process(s, mode)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            print(f"{mode.name:16} {size:8}文字 {best:8.4f}秒 {size / best:12.0f}文字/秒" + (f" （前回の{best / times[-1]:.2f}倍）" if times else ""))
+            times.append(best)
+        ratio = (times[-1] / SCALING_SIZES[-1]) / (times[0] / SCALING_SIZES[0])
+        print(f"{mode.name:16} 1文字あたりの変換時間: {SCALING_SIZES[0]}文字の{ratio:.2f}倍（{SCALING_SIZES[-1]}文字）")
+        if ratio > SCALING_LIMIT:
+            failed += 1
+    if failed:
+        sys.stderr.write(f"{failed}件の変換モードで、1文字あたりの変換時間が、{SCALING_SIZES[0]}文字の文書の{SCALING_LIMIT}倍を超えました。\n")
+    return failed
+
+
+def calibrate():
+    """
+    変換とは関係のない一定の処理にかかる時間を計測する。
+    基準値を保存したときとマシンの速さが異なる場合に、時間の基準値をこの比率で補正する。
+    """
+    words = [f"word{i}" for i in range(1000)]
+    table = {word: word.upper() for word in words}
+    best = None
+    for _ in range(REPEAT * 3):
+        gc.collect()
+        start = time.perf_counter()
+        for _ in range(100):
+            "".join([table.get(word, word) for word in words if not word.endswith("7")])
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def compareBaseline(metrics, baseline, tolerance):
+    """計測結果を基準値と比較し、悪化した項目の数を返す"""
+    failed = 0
+    # マシンの速さの違いを補正する
+    speed = metrics["calibration.seconds"] / baseline["calibration.seconds"] if "calibration.seconds" in baseline else 1.0
+    print(f"マシンの速さの補正: {speed:.2f}倍")
+    for name, value in metrics.items():
+        if name not in baseline or name == "calibration.seconds":
+            continue
+        base = baseline[name]
+        if name.endswith(".seconds"):
+            base *= speed
+        if value <= base * tolerance:
+            continue
+        if name.endswith(".seconds") and value - base < NOISE_SECONDS:
+            continue
+        print(f"悪化: {name} {base:.6g} -> {value:.6g} （{value / base if base else float('inf'):.2f}倍）")
+        failed += 1
+    if failed:
+        sys.stderr.write(f"{failed}件の項目が、基準値の{tolerance}倍を超えて悪化しました。\n")
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="englishToKanaConverterのベンチマーク")
+    parser.add_argument("--update", action="store_true", help="計測結果を基準値として保存する")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help=f"基準値のファイル（既定値: {BASELINE_FILE}）")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help=f"基準値の何倍を超えたら悪化とみなすか（既定値: {TOLERANCE}）")
+    args = parser.parse_args(argv)
+
+    metrics = {"calibration.seconds": calibrate()}
+    print("## モジュールと辞書の読み込み")
+    metrics.update(measureCold())
+    for name, value in metrics.items():
+        print(f"{name:30} {value:8.4f}秒")
+    print("## メモリ使用量")
+    memory = measureMemory()
+    for name, value in memory.items():
+        print(f"{name:30} {value / 1024 / 1024:8.2f}MB")
+    metrics.update(memory)
+
+    c = EnglishToKanaConverter()
+    # 辞書の読み込みを計測に含めない
+    c.process("hello")
+    loads = workloads()
+    print("## 変換時間")
+    metrics.update(measureThroughput(c, loads))
+    print("## 処理段階ごとの実行時間")
+    metrics.update(measureStages(loads))
+    print("## 読めない長い文字列")
+    failed = checkPathological(c)
+    print("## 文書の大きさに対する線形性")
+    failed += checkScaling(c)
+
+    if args.update:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(), "metrics": metrics}, f, ensure_ascii=False, indent="\t", sort_keys=True)
+            f.write("\n")
+        print(f"基準値を{args.baseline}に保存しました。")
+    elif os.path.exists(args.baseline):
+        print("## 基準値との比較")
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["metrics"]
+        failed += compareBaseline(metrics, baseline, args.tolerance)
+    else:
+        print(f"基準値（{args.baseline}）がないため、比較は行いません。--updateを付けて実行すると保存されます。")
+    return failed
+
+
+if __name__ == "__main__":
+    if main():
+        sys.exit(1)
+    print("Done!")
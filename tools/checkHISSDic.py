@@ -1,44 +1,219 @@
+# HISSの読み辞書に登録されている英単語の内、本モジュールで変換できないものを抽出する
+#
+# 辞書（CSV）は少しずつ読み込み、重複を除いた単語を一定数ずつまとめて複数のプロセスで変換する。
+# 調べ終えた単語と変換できなかった単語は、その都度ジャーナル（出力ファイル名.journal）に追記するため、
+# 途中で中断しても、再度実行すれば続きから再開できる（--restartを付けると最初からやり直す）。
+# すべて調べ終えると、変換できなかった単語と読みを出力ファイル（既定値: failed.txt）にJSONで保存し、ジャーナルを削除する。
+
+import argparse
+import collections
 import csv
 import json
+import multiprocessing
 import os
 import re
 import sys
+import time
 
 # englishToKanaConverter moduleのimportを可能にする
 sys.path.append(os.getcwd())
 
 from englishToKanaConverter.constants import ZENHAN_TABLE
-from englishToKanaConverter import ConversionMode, EnglishToKanaConverter
+from englishToKanaConverter import ConversionMode, EnglishToKanaConverter, preload
 
+# 1度にワーカープロセスへ渡す単語数
+BATCH_SIZE = 1000
+# ワーカープロセスあたりの、結果を待たずに渡しておくまとまりの数
+PENDING_PER_WORKER = 4
+# 進捗を表示する間隔（秒）
+PROGRESS_INTERVAL = 1.0
 
-if __name__ == "__main__":
-    file = "HISS_dic\\main.csv"
-    if not os.path.isfile(file):
-        sys.stderr.write("File does not exist.\n")
-        sys.exit(1)
+_ZENHAN = str.maketrans(ZENHAN_TABLE)
+
+# ワーカープロセスで使うインスタンス（forkで起動した場合は、読み込み済みの辞書ごと引き継がれる）
+_converter = None
+
+
+def _initWorker():
+    global _converter
+    if _converter is None:
+        _converter = EnglishToKanaConverter()
+
+
+def checkBatch(words):
+    """
+    wordsの内、変換できなかった単語のリストを返す。
+    KEEP_UNREADABLEで変換した結果に、アルファベットかアポストロフィーが残る単語を、変換できなかったものとする。
+    """
+    result = []
+    for word in words:
+        lower = word.lower()
+        # アルファベットが残るかどうかは、変換結果を作らずに調べられる
+        if _converter.analyze(lower).unresolved:
+            result.append(word)
+        # アポストロフィーが残るかどうかは、変換しないとわからない（goin'など）
+        elif "'" in lower and "'" in _converter.process(lower, ConversionMode.KEEP_UNREADABLE):
+            result.append(word)
+    return result
 
-    with open(file, "r", encoding="utf-8") as f:
-        reader = csv.reader(f)
-        data = list(reader)
+
+class Progress:
+    """読み込んだ位置と調べた単語数から、進捗と速度を表示する"""
+
+    def __init__(self, total):
+        self.total = total
+        self.position = 0
+        self.checked = 0
+        self.failed = 0
+        self.start = time.perf_counter()
+        self.shown = 0
+
+    def show(self, force=False):
+        now = time.perf_counter()
+        if not force and now - self.shown < PROGRESS_INTERVAL:
+            return
+        self.shown = now
+        elapsed = now - self.start
+        percent = self.position * 100 / self.total if self.total else 100
+        rate = self.checked / elapsed if elapsed else 0
+        sys.stderr.write(f"\r{percent:5.1f}% {self.checked}語を調べました（変換できなかった単語: {self.failed}語, {rate:.0f}語/秒）")
+        sys.stderr.flush()
+
+
+def readEntries(path, progress):
+    """CSVファイルpathを1行ずつ読み込み、(単語, 読み)を返す。単語は半角の大文字にし、英単語でないものは除く"""
+    def lines():
+        with open(path, "rb") as f:
+            for line in f:
+                progress.position += len(line)
+                yield line.decode("utf-8")
+
+    reader = csv.reader(lines())
     # ヘッダ行は無視
-    data = data[1:]
-    c = EnglishToKanaConverter()
-    success = {}
-    failed = {}
-    for i in data:
-        word = i[0]
+    next(reader, None)
+    for row in reader:
         # すべて半角の大文字にする
-        word = word.upper()
-        word = word.translate(str.maketrans(ZENHAN_TABLE))
+        word = row[0].upper().translate(_ZENHAN)
         if not re.match("[A-Z']+$", word):
             continue
-        converted = c.process(word.lower(), ConversionMode.KEEP_UNREADABLE)
-        if not re.search("[a-z']", converted):
-            continue
-        # 発音記号を削除
-        i[1] = re.sub("[’＿]", "", i[1])
-        failed[word] = i[1]
-    print("%d words" % len(failed))
-    with open("failed.txt", "w", encoding="utf-8", newline="") as f:
-        json.dump(failed, f, ensure_ascii=False, indent=4)
+        yield word, row[1]
+
+
+def readJournal(path):
+    """
+    ジャーナルから、調べ終えた単語の集合と、変換できなかった単語の集合、正しく書き込まれた部分の大きさ（バイト）を返す。
+    書き込み中に中断された行があれば、それ以降は読み込まない。
+    """
+    checked = set()
+    failed = set()
+    size = 0
+    if not os.path.isfile(path):
+        return checked, failed, size
+    with open(path, "rb") as f:
+        for line in f:
+            try:
+                if not line.endswith(b"\n"):
+                    raise ValueError("incomplete line")
+                record = json.loads(line.decode("utf-8"))
+            except ValueError:
+                # 書き込み中に中断された行
+                break
+            checked.update(record["checked"])
+            failed.update(record["failed"])
+            size += len(line)
+    return checked, failed, size
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HISSの読み辞書に登録されている英単語の内、変換できないものを抽出する")
+    parser.add_argument("--dic", default=os.path.join("HISS_dic", "main.csv"), help="HISSの読み辞書のCSVファイル")
+    parser.add_argument("--output", default="failed.txt", help="結果を保存するファイル（既定値: failed.txt）")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="ワーカープロセスの数（既定値: CPUの数）")
+    parser.add_argument("--restart", action="store_true", help="中断した結果を使わず、最初から調べ直す")
+    args = parser.parse_args(argv)
+
+    if not os.path.isfile(args.dic):
+        sys.stderr.write("File does not exist.\n")
+        return 1
+    journalPath = args.output + ".journal"
+    if args.restart and os.path.exists(journalPath):
+        os.remove(journalPath)
+    checked, failed, journalSize = readJournal(journalPath)
+    if os.path.isfile(journalPath) and os.path.getsize(journalPath) > journalSize:
+        # 中断された行の後ろに追記すると、次に再開するときに追記した結果を読み込めないため、正しく書き込まれた部分まで切り詰める
+        os.truncate(journalPath, journalSize)
+    if checked:
+        print(f"中断した結果を使い、{len(checked)}語を調べ終えたものとして続きから再開します。")
+
+    # 辞書などをワーカーの起動前に読み込んでおき、forkで引き継がせる
+    global _converter
+    preload()
+    _converter = EnglishToKanaConverter()
+    _converter.process("hello")
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+    else:
+        context = multiprocessing.get_context()
+
+    progress = Progress(os.path.getsize(args.dic))
+    progress.checked = len(checked)
+    progress.failed = len(failed)
+    # 単語から読みへのdict（同じ単語が複数あれば、最後の読みを使う）。順序は最初に出現した順
+    readings = {}
+    # 結果を待っているまとまりと、その単語
+    pending = collections.deque()
+
+    with open(journalPath, "a", encoding="utf-8") as journal, context.Pool(args.workers, initializer=_initWorker) as pool:
+
+        def receive():
+            words, result = pending.popleft()
+            found = result.get()
+            failed.update(found)
+            journal.write(json.dumps({"checked": words, "failed": {word: readings[word] for word in found}}, ensure_ascii=False) + "\n")
+            journal.flush()
+            progress.checked += len(words)
+            progress.failed += len(found)
+            progress.show()
+
+        def submit(words):
+            pending.append((words, pool.apply_async(checkBatch, (words,))))
+            # 読み込みが先に進みすぎないよう、待っているまとまりが一定数を超えたら結果を受け取る
+            while len(pending) > args.workers * PENDING_PER_WORKER:
+                receive()
+
+        batch = []
+        for word, reading in readEntries(args.dic, progress):
+            isNew = word not in readings
+            readings[word] = reading
+            if not isNew or word in checked:
+                continue
+            batch.append(word)
+            if len(batch) >= BATCH_SIZE:
+                submit(batch)
+                batch = []
+        if batch:
+            submit(batch)
+        while pending:
+            receive()
+    progress.show(True)
+    sys.stderr.write("\n")
+
+    result = {}
+    for word, reading in readings.items():
+        if word in failed:
+            # 発音記号を削除
+            result[word] = re.sub("[’＿]", "", reading)
+    print("%d words" % len(result))
+    with open(args.output, "w", encoding="utf-8", newline="") as f:
+        json.dump(result, f, ensure_ascii=False, indent=4)
+    os.remove(journalPath)
     print("Done!")
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        sys.stderr.write("\n中断しました。再度実行すると、続きから再開します。\n")
+        sys.exit(1)
@@ -0,0 +1,267 @@
+# 変換処理の差分テスト
+#
+# 本体（EnglishToKanaConverter）と、高速化を始める前の変換処理を凍結した参照実装（referenceConverter.py）とで、
+# 大量の入力をすべての変換モードで変換し、結果が一致することを確かめる。
+# 入力（コーパス）は、辞書と定数のすべてのキー、HISSの読み辞書の単語（存在する場合）、および乱数で生成した文字列。
+# 一致しなかった入力は、一致しないまま短くできるところまで短くした（最小化した）ものを報告する。
+# 同じコーパスを両者で変換した時間と速度比も表示するため、高速化の効果と、変換結果が変わっていないことを同時に確かめられる。
+# 一致しない入力があれば、終了コード1で終了する。
+
+import argparse
+import csv
+import gc
+import os
+import random
+import sys
+import time
+
+# englishToKanaConverter moduleのimportを可能にする
+sys.path.append(os.getcwd())
+
+from englishToKanaConverter import ConversionMode, EnglishToKanaConverter, constants, dictionaries
+from englishToKanaConverter.constants import ZENHAN_TABLE
+
+from referenceConverter import ReferenceConverter
+
+# 乱数で生成する文字列の数（コーパスごと）
+RANDOM_SIZE = 20000
+# 報告する、一致しなかった入力の最大数
+MAX_REPORT = 20
+# 最小化で試す変換の最大回数（入力1件あたり）
+MINIMIZE_LIMIT = 2000
+# 乱数で生成する単語の最大の長さ
+# 参照実装の複合語分解は、単語の長さに対して指数関数的に遅くなることがあるため、長くしすぎないこと
+MAX_WORD_LENGTH = 12
+
+_LOWER = "abcdefghijklmnopqrstuvwxyz"
+_UPPER = _LOWER.upper()
+# 単語の間に入れる文字
+_SEPARATORS = (" ", " ", " ", ", ", ". ", "-", "/", "_", "、", "。", "の", "を", "1", "2020", "(", ")", "\n")
+# 全角アルファベットとアクセント記号付きラテン文字（前処理で変換される文字）
+_TO_FULL_WIDTH = str.maketrans({half: full for full, half in ZENHAN_TABLE.items()})
+_DIACRITICS = tuple(constants.DIACRITIC_TABLE)
+
+
+def dictionaryKeys():
+    """辞書と定数のすべてのキーを、小文字、大文字、先頭だけ大文字の3通りにしたもの"""
+    keys = set()
+    for name in ("WORDS", "PHRASES", "PREFIX", "SUFFIX", "ROMAN", "SPELL"):
+        keys.update(getattr(dictionaries, name))
+    keys.update(constants.UPPER_IGNORE)
+    keys.update(constants.MUST_SPELLED)
+    result = set()
+    for key in keys:
+        result.update((key.lower(), key.upper(), key.capitalize()))
+    return sorted(result)
+
+
+def hissWords(path):
+    """HISSの読み辞書pathの単語（ファイルがなければNone）"""
+    if not os.path.isfile(path):
+        return None
+    words = set()
+    with open(path, encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        # ヘッダ行は無視
+        next(reader, None)
+        for row in reader:
+            if row:
+                words.add(row[0])
+    return sorted(words)
+
+
+def _randomCase(rng, word):
+    """wordの大文字・小文字を、よく見られる形のいずれかにする"""
+    kind = rng.random()
+    if kind < 0.4:
+        return word.lower()
+    if kind < 0.6:
+        return word.capitalize()
+    if kind < 0.75:
+        return word.upper()
+    return "".join(char.upper() if rng.random() < 0.3 else char.lower() for char in word)
+
+
+def _randomLetters(rng):
+    """ランダムなアルファベットの連続（アポストロフィーを含むことがある）"""
+    length = rng.randint(1, MAX_WORD_LENGTH)
+    chars = [rng.choice(_LOWER) for _ in range(length)]
+    if length > 2 and rng.random() < 0.3:
+        chars.insert(rng.randint(1, length - 1), "'")
+    return _randomCase(rng, "".join(chars))
+
+
+def _randomCompound(rng, phrases, prefixes, suffixes):
+    """辞書のキーをつなげた単語（接頭語や接尾語を付けることがある）"""
+    parts = [rng.choice(phrases) for _ in range(rng.randint(1, 3))]
+    if rng.random() < 0.2:
+        parts.insert(0, rng.choice(prefixes))
+    if rng.random() < 0.3:
+        parts.append(rng.choice(suffixes))
+    word = "".join(parts)[:MAX_WORD_LENGTH * 2]
+    if rng.random() < 0.3:
+        # キャメルケース
+        return "".join(part.capitalize() for part in parts)[:MAX_WORD_LENGTH * 2]
+    return _randomCase(rng, word)
+
+
+def _randomUpper(rng, phrases):
+    """大文字の連続を含む単語（XMLHttpRequestのような形）"""
+    acronym = "".join(rng.choice(_UPPER) for _ in range(rng.randint(1, 6)))
+    if rng.random() < 0.3:
+        acronym = rng.choice(constants.UPPER_IGNORE)
+    rest = rng.choice(phrases).capitalize() if rng.random() < 0.7 else ""
+    if rng.random() < 0.2:
+        return rest + acronym
+    return acronym + rest + (rng.choice(("s", "'s", "es", "ing")) if rng.random() < 0.2 else "")
+
+
+def _decorate(rng, word):
+    """全角文字やアクセント記号付きの文字、全角のアポストロフィーを混ぜる"""
+    chars = list(word)
+    for _ in range(rng.randint(1, 2)):
+        i = rng.randrange(len(chars))
+        kind = rng.random()
+        if kind < 0.4:
+            chars[i] = chars[i].translate(_TO_FULL_WIDTH)
+        elif kind < 0.8 and _DIACRITICS:
+            chars[i] = rng.choice(_DIACRITICS)
+        else:
+            chars.insert(i, "’")
+    return "".join(chars)
+
+
+def randomStrings(seed, size):
+    """乱数で生成した文字列のコーパスを、名前からリストへのdictで返す"""
+    rng = random.Random(seed)
+    phrases = sorted(key for key in dictionaries.PHRASES if len(key) <= MAX_WORD_LENGTH)
+    prefixes = sorted(dictionaries.PREFIX)
+    suffixes = sorted(dictionaries.SUFFIX)
+
+    def sentence(makeWord):
+        words = [makeWord() for _ in range(rng.randint(1, 6))]
+        result = [words[0]]
+        for word in words[1:]:
+            result.append(rng.choice(_SEPARATORS))
+            result.append(word)
+        return "".join(result)
+
+    return {
+        "random": [sentence(lambda: _randomLetters(rng)) for _ in range(size)],
+        "compound": [sentence(lambda: _randomCompound(rng, phrases, prefixes, suffixes)) for _ in range(size)],
+        "mixed": [sentence(lambda: rng.choice((
+            lambda: _randomUpper(rng, phrases),
+            lambda: _decorate(rng, _randomCompound(rng, phrases, prefixes, suffixes)),
+            lambda: _decorate(rng, _randomLetters(rng)),
+            lambda: _randomLetters(rng),
+        ))()) for _ in range(size)],
+    }
+
+
+def _convert(converter, s, mode):
+    """sを変換した結果を返す。例外が発生した場合は、その内容を表す文字列を返す"""
+    try:
+        return converter.process(s, mode)
+    except Exception as e:
+        return f"<{type(e).__name__}: {e}>"
+
+
+def minimize(s, differs):
+    """differs(s)がTrueのまま、sからできるだけ多くの文字を取り除いた文字列を返す（delta debugging）"""
+    tries = 0
+    # 1度に取り除く部分の数
+    n = 2
+    while len(s) >= 2 and tries < MINIMIZE_LIMIT:
+        size = -(-len(s) // n)
+        for start in range(0, len(s), size):
+            candidate = s[:start] + s[start + size:]
+            tries += 1
+            if candidate and differs(candidate):
+                s = candidate
+                n = max(n - 1, 2)
+                break
+        else:
+            if n >= len(s):
+                break
+            n = min(n * 2, len(s))
+    return s
+
+
+def compare(name, texts, modes, converter, reference, failures):
+    """textsを両者で変換して比較し、変換モードごとの結果を表示する。一致しなかった入力は、failuresに(コーパスの名前, モード, 入力)で追加する"""
+    for mode in modes:
+        gc.collect()
+        start = time.perf_counter()
+        expected = [_convert(reference, s, mode) for s in texts]
+        referenceTime = time.perf_counter() - start
+        gc.collect()
+        start = time.perf_counter()
+        actual = [_convert(converter, s, mode) for s in texts]
+        converterTime = time.perf_counter() - start
+        mismatches = [s for s, e, a in zip(texts, expected, actual) if e != a]
+        failures.extend((name, mode, s) for s in mismatches)
+        speedup = referenceTime / converterTime if converterTime else float("inf")
+        print(f"{name:10} {mode.name:16} {len(texts):8}件 不一致{len(mismatches):6}件 参照実装{referenceTime:9.3f}秒 本体{converterTime:9.3f}秒 （{speedup:.2f}倍）")
+
+
+def report(failures, converter, reference, limit):
+    """一致しなかった入力を最小化して表示する（同じ形に最小化されたものは1度だけ表示する）"""
+    seen = set()
+    for name, mode, s in failures:
+        if len(seen) >= limit:
+            print(f"（以降の不一致は省略しました。全部で{len(failures)}件）")
+            break
+        minimized = minimize(s, lambda candidate: _convert(reference, candidate, mode) != _convert(converter, candidate, mode))
+        if (mode, minimized) in seen:
+            continue
+        seen.add((mode, minimized))
+        print(f"[{name}, {mode.name}] {s!r}")
+        print(f"  最小化した入力: {minimized!r}")
+        print(f"  参照実装: {_convert(reference, minimized, mode)!r}")
+        print(f"  本体:     {_convert(converter, minimized, mode)!r}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="本体と参照実装の変換結果を比較する")
+    parser.add_argument("--hiss", default=os.path.join("HISS_dic", "main.csv"), help="HISSの読み辞書のCSVファイル（存在しなければ使わない）")
+    parser.add_argument("--seed", type=int, default=0, help="文字列の生成に使う乱数の種（既定値: 0）")
+    parser.add_argument("--random", type=int, default=RANDOM_SIZE, help=f"乱数で生成する文字列の数（コーパスごと。既定値: {RANDOM_SIZE}）")
+    parser.add_argument("--limit", type=int, default=0, help="各コーパスから使う入力の最大数（0なら制限しない）")
+    parser.add_argument("--mode", choices=[mode.name for mode in ConversionMode], action="append", help="比較する変換モード（複数指定可。省略時はすべて）")
+    parser.add_argument("--cache", action="store_true", help="本体のキャッシュを有効にして比較する")
+    parser.add_argument("--max-report", type=int, default=MAX_REPORT, help=f"表示する不一致の最大数（既定値: {MAX_REPORT}）")
+    args = parser.parse_args(argv)
+
+    modes = [ConversionMode[name] for name in args.mode] if args.mode else list(ConversionMode)
+    if args.cache:
+        converter = EnglishToKanaConverter(cacheSize=100000, wordCacheSize=100000)
+    else:
+        converter = EnglishToKanaConverter()
+    reference = ReferenceConverter()
+    # 辞書の読み込みを、時間の計測に含めない
+    converter.process("hello")
+    reference.process("hello")
+
+    corpora = {"keys": dictionaryKeys()}
+    hiss = hissWords(args.hiss)
+    if hiss is None:
+        print(f"{args.hiss}が存在しないため、HISSの読み辞書は使いません。")
+    else:
+        corpora["hiss"] = hiss
+    corpora.update(randomStrings(args.seed, args.random))
+
+    failures = []
+    for name, texts in corpora.items():
+        if args.limit:
+            texts = texts[:args.limit]
+        compare(name, texts, modes, converter, reference, failures)
+    if failures:
+        print(f"## 不一致（{len(failures)}件）")
+        report(failures, converter, reference, args.max_report)
+        return 1
+    print("すべての入力で一致しました。")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,6 +7,8 @@ import sys
 # englishToKanaConverter moduleのimportを可能にする
 sys.path.append(os.getcwd())
 from englishToKanaConverter.constants import ZENHAN_TABLE
+from englishToKanaConverter import dictionaryTrie, wordTable
+from englishToKanaConverter.dictionaries import compiledDictionary
 
 
 def normalizeKey(key):
@@ -36,6 +38,13 @@ def optimizeDictionary(path):
         f.write("\n")
 
 
+def compileDictionary(path):
+    # 最適化後のJSONから、メモリマップして使うコンパイル済み辞書を生成する
+    outputPath = f"{os.path.splitext(path)[0]}.bin"
+    compiledDictionary.build(path, outputPath)
+    print(f"{os.path.basename(outputPath)}を生成しました。")
+
+
 def optimizeWordList(path):
     with open(path, "r", encoding="utf-8") as f:
         oldData = json.load(f)
@@ -61,6 +70,7 @@ if __name__ == "__main__":
         print(f"{os.path.basename(path)}を処理しています。")
         optimizeDictionary(path)
         print(f"{os.path.basename(path)}を保存しました。")
+        compileDictionary(path)
 
     listFiles = glob.glob(os.path.join("englishToKanaConverter", "constants", "*.json"))
     # diacritics.jsonは単語リストではなく生成物（tools/generateDiacriticsTable.py参照）のため対象外
@@ -69,3 +79,11 @@ if __name__ == "__main__":
         print(f"{os.path.basename(path)}を処理しています。")
         optimizeWordList(path)
         print(f"{os.path.basename(path)}を保存しました。")
+
+    # 辞書のトライと、単語全体の変換結果の表は、最適化後の辞書と単語リストから作る
+    print(f"{os.path.basename(dictionaryTrie.PATH)}を生成しています。")
+    count = dictionaryTrie.save()
+    print(f"{os.path.basename(dictionaryTrie.PATH)}を生成しました。ノード数: {count}")
+    print(f"{os.path.basename(wordTable.PATH)}を生成しています。")
+    count = wordTable.build()
+    print(f"{os.path.basename(wordTable.PATH)}を生成しました。登録単語数: {count}")
@@ -0,0 +1,359 @@
+# 差分テスト（tools/differential.py）で使う、変換処理の参照実装
+#
+# 高速化を始める前のEnglishToKanaConverterの変換処理を、そのまま凍結したもの（デバッグ用のログ出力の呼び出しも、速度の比較のために残している）。
+# 辞書と定数のデータは本体と同じファイルから読み込むが、読み込み処理（コンパイル済み辞書など）を含め、本体の変換処理のコードは使わない。
+# 本体の変換結果は、常にこの実装と一致しなければならない。変換結果を意図して変更する場合を除き、このファイルは編集しないこと。
+
+import json
+import logging
+import os
+import re
+import sys
+from typing import List, Tuple
+
+# englishToKanaConverter moduleのimportを可能にする
+sys.path.append(os.getcwd())
+
+from englishToKanaConverter.constants import SPELL_SEPARATOR, ZENHAN_TABLE
+from englishToKanaConverter.conversionMode import ConversionMode
+
+_PACKAGE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "englishToKanaConverter")
+
+
+def _loadJson(*path):
+    with open(os.path.join(_PACKAGE_DIR, *path), encoding="utf-8") as f:
+        return json.load(f)
+
+
+class _Dictionaries:
+    """辞書（englishToKanaConverter/dictionariesのJSONファイル）"""
+
+    def __init__(self) -> None:
+        self.PHRASES = _loadJson("dictionaries", "phrases.json")
+        self.PREFIX = _loadJson("dictionaries", "prefix.json")
+        self.ROMAN = _loadJson("dictionaries", "roman.json")
+        self.SPELL = _loadJson("dictionaries", "spell.json")
+        self.SUFFIX = _loadJson("dictionaries", "suffix.json")
+        self.WORDS = _loadJson("dictionaries", "words.json")
+
+
+dictionaries = _Dictionaries()
+
+# 定数（当時のenglishToKanaConverter/constants.pyと同じ）
+UPPER_MAX = 3
+UPPER_IGNORE = tuple(_loadJson("constants", "upper_ignore.json"))
+ROMAN_MIN = 3
+SOKUON_IGNORE = ("A", "I", "U", "E", "O", "N")
+DIACRITIC_TABLE = _loadJson("constants", "diacritics.json")
+MUST_SPELLED = tuple(_loadJson("constants", "must_spelled.json"))
+
+# ログ出力（常に無効。本体のロガーとは共有しない）
+_log = logging.Logger("ReferenceConverter", logging.CRITICAL)
+_log.addHandler(logging.NullHandler())
+
+
+class ReferenceConverter:
+    def __init__(self) -> None:
+        self.log = _log
+
+    def _zenToHan(self, s: str) -> str:
+        self.log.debug(f"zenToHan in: {s}")
+        s = s.translate(str.maketrans(ZENHAN_TABLE))
+        self.log.debug(f"zenToHan out: {s}")
+        return s
+
+    def _removeDiacritics(self, s: str) -> str:
+        self.log.debug(f"removeDiacritics in: {s}")
+        s = s.translate(str.maketrans(DIACRITIC_TABLE))
+        self.log.debug(f"removeDiacritics out: {s}")
+        return s
+
+    def _splitUpperCase(self, s: str) -> List[str]:
+        self.log.debug(f"splitUpperCase in: {s}")
+        ret = []
+        self.log.debug("searching for upper case")
+        # 大文字を探す（アポストロフィーを挟んだ大文字の連続も1つの大文字列として扱う）
+        result = re.finditer("[^A-Z]?([A-Z]+(?:'[A-Z]+)*)", s)
+        result = list(result)
+        # 文字の挿入時にインデックスが狂わないように後ろから処理する
+        result.reverse()
+        for match in result:
+            self.log.debug(f"match: {match.group(1)}")
+            length = match.end(1) - match.start(1)
+            self.log.debug(f"length: {length}")
+            if length > UPPER_MAX:
+                # 一定以上長い大文字列
+                if len(s) == match.end(1) or len(s) > match.end(1) and not s[match.end(1)].islower():
+                    # 大文字列の手前で分割
+                    ret.insert(0, s[match.start(1):])
+                    s = s[:match.start(1)]
+                    self.log.debug(f"current: {ret[0]}")
+                    self.log.debug(f"remain: {s}")
+                    self.log.debug("skipped")
+                    continue
+                # 大文字列の末尾から新しい単語が始まる
+                ret.insert(0, s[match.end(1) - 1:])
+                s = s[:match.end(1) - 1]
+                self.log.debug(f"current: {ret[0]}")
+                self.log.debug(f"remain: {s}")
+                phrase = s[match.start(1):]
+                if len(phrase) > UPPER_MAX or phrase in UPPER_IGNORE:
+                    # 大文字列の手前で分割
+                    ret.insert(0, s[match.start(1):])
+                    s = s[:match.start(1)]
+                    self.log.debug(f"current: {ret[0]}")
+                    self.log.debug(f"remain: {s}")
+                    self.log.debug("skipped")
+                    continue
+                for cnt in range(match.end(1) - 2, match.start(1) - 1, -1):
+                    ret.insert(0, s[cnt:])
+                    s = s[:cnt]
+                    self.log.debug(f"current: {ret[0]}")
+                    self.log.debug(f"remain: {s}")
+                continue
+            elif match.group(1) in UPPER_IGNORE:
+                # 特定の大文字列は無視
+                self.log.debug(f"{match.group(1)} must be ignored")
+                self.log.debug("skipped")
+                continue
+            for cnt in range(match.end(1) - 1, match.start(1) - 1, -1):
+                ret.insert(0, s[cnt:])
+                s = s[:cnt]
+                self.log.debug(f"current: {ret[0]}")
+                self.log.debug(f"remain: {s}")
+        # 残った文字があれば追加
+        if s:
+            ret.insert(0, s)
+        self.log.debug(f"splitUpperCase out: {ret}")
+        return ret
+
+    def _engToKana(self, s: str) -> str:
+        self.log.debug(f"engToKana in: {s}")
+        # 英語がカナになった結果の格納用
+        result = ""
+        while len(s) > 0:
+            match = re.search("[a-zA-Z']+", s)
+            if match is None:
+                # 残りは日本語か記号
+                result += s
+                break
+            # 英語が出てくるまででは処理不要
+            result += s[:match.start()]
+            self.log.debug(f"match: {match.group()}")
+            # 単独で存在すべき文字列と合致するか
+            val = dictionaries.WORDS.get(match.group().upper())
+            if val is not None:
+                # 変換できた
+                self.log.debug(f"whole converted: {match.group()} -> {val}")
+                result += val
+                s = s[match.end():]
+                continue
+            # 複合語や接尾語も考慮しつつ変換する
+            success, converted, remaining = self._partsToKana(match.group())
+            result += converted
+            s = s[match.end():]
+        self.log.debug(f"engToKana out: {result}")
+        return result
+
+    def _partsToKana(self, s: str, includePrefix: bool = True) -> Tuple[bool, str, str]:
+        self.log.debug(f"partsToKana in: {s}")
+        # 変数の初期化
+        success = False
+        converted = ""
+        remaining = ""
+        # 文字数を減らしながら変換できそうな単語を探す
+        for cnt in range(len(s), 0, -1):
+            target = s[0:cnt]
+            targetUpper = target.upper()
+            self.log.debug(f"checking: {target}")
+            # 「必ずスペルアウトしなければならない文字列」かどうかを調べる
+            if targetUpper in MUST_SPELLED:
+                # 強制的にスペルアウト
+                self.log.debug(f"{target} must be spelled out")
+                converted = self._alphaToSpell(target)
+            # 単独のアポストロフィーは変換できたものとして扱う
+            elif target == "'":
+                self.log.debug(f"single apostrophe found: {target}")
+                converted = "'"
+            else:
+                # 普通に辞書引き
+                converted = dictionaries.PHRASES.get(targetUpper, "")
+                # 必要なら接頭語のチェック
+                if not converted and includePrefix and s[cnt:]:
+                    converted = dictionaries.PREFIX.get(targetUpper, "")
+                    # ログを出すだけ
+                    if converted:
+                        self.log.debug(f"prefix {target} -> {converted}")
+            if converted == "":
+                # 変換できなかった
+                self.log.debug(f"not found: {target}")
+                success = False
+                continue
+            success = True
+            self.log.debug(f"found: {target} -> {converted}")
+            remaining = s[cnt:]
+            if remaining == "":
+                self.log.debug(f"partsToKana out: success={success}, converted={converted}, remaining={remaining}")
+                return success, converted, remaining
+            # 接尾語の確認
+            suffix = ""
+            if target != "'":
+                suffix = dictionaries.SUFFIX.get(remaining.upper(), "")
+            if suffix:
+                # 接尾語が見つかった
+                self.log.debug(f"suffix {remaining} -> {suffix}")
+                converted += suffix
+                self.log.debug(f"partsToKana out: success={success}, converted={converted}, remaining={''}")
+                return success, converted, ""
+            # 続きをチェック
+            success2, converted2, remaining2 = self._partsToKana(remaining, False)
+            if not success2:
+                # 変換できなかった
+                success = False
+                continue
+            self.log.debug(f"partsToKana out: success={success}, converted={converted + converted2}, remaining={remaining2}")
+            return success, converted + converted2, remaining2
+        # すべて変換できなかった
+        success = False
+        converted = s
+        remaining = ""
+        self.log.debug(f"partsToKana out: success={success}, converted={converted}, remaining={remaining}")
+        return success, converted, remaining
+
+    def _romanToKana(self, s: str) -> str:
+        self.log.debug(f"romanToKana in: {s}")
+        # 結果の格納用
+        result = ""
+        while len(s) > 0:
+            match = re.search("[a-zA-Z]+", s)
+            if match is None:
+                # 残りは日本語か記号
+                result += s
+                break
+            # 英語が出てくるまででは処理不要
+            result += s[:match.start()]
+            self.log.debug(f"match: {match.group()}")
+            # 変換元の文字列（辞書と合わせるためにすべて大文字）
+            word = match.group().upper()
+            if len(word) < ROMAN_MIN:
+                # 短い単語は変換しない
+                self.log.debug(f"skipped: {match.group()}")
+                result += match.group()
+                s = s[match.end():]
+                continue
+            # 変換結果の一時保存用
+            tmpResult = ""
+            index = 0
+            while index != len(word):
+                # 促音の判定
+                # 次に文字があれば
+                if index != len(word) - 1:
+                    phrase = word[index:index + 2]
+                    if phrase[0] == phrase[1] and phrase[0] not in SOKUON_IGNORE:
+                        # 促音が見つかった
+                        self.log.debug(f"sokuon {phrase} found")
+                        tmpResult += "ッ"
+                        self.log.debug(f"tmpResult: {tmpResult}")
+                        index += 1
+                        continue
+                found = dictionaries.ROMAN.get(word[index], "")
+                if found != "":
+                    self.log.debug(f"found: {word[index]} -> {found}")
+                    # 最後の文字ならば
+                    if index == len(word) - 1:
+                        tmpResult += found
+                        index = len(word)
+                        continue
+                    nextIndex = index
+                    for i in range(index + 2, len(word) + 1):
+                        self.log.debug(f"searching for: {word[index: i]}")
+                        newFound = dictionaries.ROMAN.get(word[index: i], "")
+                        if newFound == "":
+                            self.log.debug(f"not found: {word[index: i]}")
+                            nextIndex = i - 1
+                            break
+                        self.log.debug(f"found: {word[index: i]} -> {newFound}")
+                        nextIndex = i
+                        found = newFound
+                    index = nextIndex
+                    tmpResult += found
+                    continue
+                else:
+                    foundFlag = False
+                    for i in range(len(word), index + 1, -1):
+                        self.log.debug(f"searching for: {word[index: i]}")
+                        newFound = dictionaries.ROMAN.get(word[index:i], "")
+                        if newFound != "":
+                            self.log.debug(f"found: {word[index: i]} -> {newFound}")
+                            foundFlag = True
+                            index = i
+                            tmpResult += newFound
+                            break
+                    if not foundFlag:
+                        # 変換できなかった
+                        tmpResult = match.group()
+                        break
+            result += tmpResult
+            s = s[match.end():]
+        self.log.debug(f"romanToKana out: {result}")
+        return result
+
+    def _trimWhitespaceBetweenUpperCase(self, s: List[str]) -> str:
+        self.log.debug(f"trimWhitespaceBetweenUpperCase in: {s}")
+        ret = "".join(s)
+        self.log.debug(f"trimWhitespaceBetweenUpperCase out: {ret}")
+        return ret
+
+    def _alphaToSpell(self, s: str, separator: str = "") -> str:
+        self.log.debug(f"alphaToSpell in: {s}")
+        # 結果の格納用
+        result = ""
+        # 未処理の文字列の先頭位置
+        index = 0
+        # アルファベットの連続を探す
+        self.log.debug("searching for alphabets")
+        for match in re.finditer("[a-zA-Z]+", s):
+            # アルファベット以外の部分はそのまま
+            result += s[index:match.start()]
+            index = match.end()
+            self.log.debug(f"found: {match.group()}")
+            # 1文字ずつ読みに変換
+            kanaList = []
+            for char in match.group():
+                kana = dictionaries.SPELL.get(char.upper())
+                if kana is None:
+                    self.log.error(f"unknown character: {char}")
+                    kana = char
+                self.log.debug(f"converted: {char} -> {kana}")
+                kanaList.append(kana)
+            # 連続するアルファベットの間にだけ区切り文字を挿入する
+            result += separator.join(kanaList)
+        # 残った文字があれば追加
+        result += s[index:]
+        self.log.debug(f"alphaToSpell out: {result}")
+        return result
+
+    def process(self, s: str, mode: ConversionMode = ConversionMode.STANDARD) -> str:
+        if not isinstance(mode, ConversionMode):
+            raise TypeError(f"mode must be a ConversionMode, not {type(mode).__name__}")
+        self.log.debug(f"process in: {s} (mode: {mode.name})")
+        s = self._zenToHan(s)
+        s = self._removeDiacritics(s)
+        if mode == ConversionMode.SPELL_ALL:
+            # 辞書を使った変換は行わず、すべてのアルファベットをスペルアウト
+            s = self._alphaToSpell(s, SPELL_SEPARATOR)
+            self.log.debug(f"process out: {s}")
+            return s
+        # 文字列を分割したリストに変換
+        s = self._splitUpperCase(s)
+        # リストの要素ごとにカナ変換
+        for i in range(len(s)):
+            s[i] = self._engToKana(s[i])
+            s[i] = self._romanToKana(s[i])
+        # リストを結合して元の状態に戻す
+        s = self._trimWhitespaceBetweenUpperCase(s)
+        if mode == ConversionMode.STANDARD:
+            # 変換できなかった箇所をスペルアウト
+            s = self._alphaToSpell(s)
+        self.log.debug(f"process out: {s}")
+        return s